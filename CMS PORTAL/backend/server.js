@@ -3,7 +3,7 @@ import http from 'http';
 import { WebSocketServer } from 'ws';
 import cors from 'cors';
 import multer from 'multer';
-import { promises as fs } from 'fs';
+import { promises as fs, createReadStream } from 'fs';
 import path from 'path';
 import os from 'os';
 import crypto from 'crypto';
@@ -398,6 +398,39 @@ async function savePlayerTokens(data) {
   await saveJSON(PLAYER_TOKENS_PATH, data);
 }
 
+// SHA-256 of an uploaded file; players verify downloads against it
+function fileChecksum(filePath) {
+  return new Promise((resolve, reject) => {
+    const hash = crypto.createHash('sha256');
+    createReadStream(filePath)
+      .on('data', chunk => hash.update(chunk))
+      .on('end', () => resolve(hash.digest('hex')))
+      .on('error', reject);
+  });
+}
+
+// Media uploaded before checksums existed gets one once at startup
+async function backfillMediaChecksums() {
+  const checksums = new Map();
+  for (const item of await loadMedia()) {
+    if (item.checksum || !item.url?.startsWith('uploads/')) continue;
+    try {
+      checksums.set(item.id, await fileChecksum(path.join(UPLOAD_DIR, path.basename(item.url))));
+    } catch (err) {
+      console.warn(`⚠️ Cannot checksum ${item.url}: ${err.message}`);
+    }
+  }
+  if (checksums.size === 0) return;
+
+  // Reload so uploads made while hashing are not lost
+  const media = await loadMedia();
+  for (const item of media) {
+    if (!item.checksum && checksums.has(item.id)) item.checksum = checksums.get(item.id);
+  }
+  await saveMedia(media);
+  console.log(`🔐 Backfilled checksums for ${checksums.size} media item(s)`);
+}
+
 function generatePlayerToken() {
   return crypto.randomBytes(32).toString('hex');
 }
@@ -450,8 +483,20 @@ function notifyPlayersOfContentChange() {
     timestamp: new Date().toISOString()
   };
 
-  // Send to all connected players immediately
-  broadcastToAllPlayers(message);
+  // Players that accept pushed schedules get the new schedule itself; older
+  // players are told to re-fetch
+  playerConnections.forEach(connection => {
+    if (!connection.playerData?.schedulePush && connection.readyState === connection.OPEN) {
+      connection.send(JSON.stringify(message));
+    }
+  });
+  queueSchedulePush();
+
+  // Wake up players long-polling /player-schedule
+  releaseScheduleWaiters();
+
+  // Schedules may have changed: re-arm the time slot timer
+  armSlotBoundaryTimer();
 
   // Also broadcast to CMS clients
   broadcastToCMS({
@@ -587,6 +632,10 @@ app.post('/media', upload.single('file'), async (req, res) => {
         groupId: documentGroupId
       }));
 
+      for (const item of pageMediaItems) {
+        item.checksum = await fileChecksum(path.join(UPLOAD_DIR, path.basename(item.url)));
+      }
+
       documentGroupItem.pages = pageMediaItems.map(item => item.id);
       media.push(documentGroupItem, ...pageMediaItems);
 
@@ -609,7 +658,8 @@ app.post('/media', upload.single('file'), async (req, res) => {
     url: `uploads/${req.file.filename}`,
     uploadedAt: new Date().toISOString(),
     uploadedBy: uploadedBy || 'Unknown',
-    fileSize: req.file.size
+    fileSize: req.file.size,
+    checksum: await fileChecksum(req.file.path)
   };
 
   media.push(newMedia);
@@ -903,13 +953,9 @@ app.post('/players/:id/command', async (req, res) => {
 });
 
 // Player state endpoints for real-time preview
-app.post('/api/players/:playerId/state', (req, res) => {
-  const { playerId } = req.params;
-  const state = req.body;
-
+function updatePlayerState(playerId, state, baseUrl) {
   // FIX: Construct the absolute URL for media robustly
   if (state.mediaUrl && !state.mediaUrl.startsWith('http')) {
-      const baseUrl = `${req.protocol}://${req.get('host')}`;
       // Use URL constructor to handle joining paths correctly, avoiding double slashes.
       const absoluteUrl = new URL(state.mediaUrl.replace(/\\/g, '/'), baseUrl);
       state.mediaUrl = absoluteUrl.href;
@@ -923,7 +969,11 @@ app.post('/api/players/:playerId/state', (req, res) => {
   if (sseConnection) {
     sseConnection.res.write(`data: ${JSON.stringify(state)}\n\n`);
   }
+}
 
+app.post('/api/players/:playerId/state', (req, res) => {
+  const { playerId } = req.params;
+  updatePlayerState(playerId, req.body, `${req.protocol}://${req.get('host')}`);
   res.sendStatus(200);
 });
 
@@ -954,72 +1004,224 @@ app.get('/api/players/:playerId/preview', (req, res) => {
   }
 });
 
-// ENHANCED Get player schedule - INCLUDES CHYRON SETTINGS
-app.get('/player-schedule/:playerId', async (req, res) => {
-  try {
-    const playerId = req.params.playerId;
-    const token = req.headers.authorization?.replace('Bearer ', '');
+// Build the schedule payload for a player. serverTime is left out so the
+// payload (and its ETag) only changes when the content actually changes.
+async function loadScheduleInputs() {
+  const [schedules, playlists, media, settings] = await Promise.all([
+    loadSchedules(),
+    loadPlaylists(),
+    loadMedia(),
+    loadSettings()
+  ]);
+  return { schedules, playlists, media, settings };
+}
 
-    if (token && !await validatePlayerToken(playerId, token)) {
-      return res.status(401).json({ error: 'Invalid token' });
-    }
+// inputs can be shared when building schedules for many players at once
+async function buildPlayerSchedule(playerId, inputs = null) {
+  const { schedules, playlists, media, settings } = inputs || await loadScheduleInputs();
 
-    const schedules = await loadSchedules();
-    const playlists = await loadPlaylists();
-    const media = await loadMedia();
-    const settings = await loadSettings();
+  const { currentDay, currentTime, currentDate } = getISTDateTime();
+
+  const activeSchedules = schedules.filter(schedule => {
+    if (!schedule.isActive) return false;
+    if (!schedule.playerIds.includes(playerId)) return false;
+    if (schedule.startDate && currentDate < schedule.startDate) return false;
+    if (schedule.endDate && currentDate > schedule.endDate) return false;
+    if (schedule.recurringDays.length > 0 && !schedule.recurringDays.includes(currentDay)) return false;
+
+    return schedule.timeSlots.some(slot =>
+      currentTime >= slot.startTime && currentTime <= slot.endTime
+    );
+  });
 
-    const { istDate, currentDay, currentTime, currentDate } = getISTDateTime();
+  let activePlaylists = [];
+  let playlistMedia = [];
 
-    const activeSchedules = schedules.filter(schedule => {
-      if (!schedule.isActive) return false;
-      if (!schedule.playerIds.includes(playerId)) return false;
-      if (schedule.startDate && currentDate < schedule.startDate) return false;
-      if (schedule.endDate && currentDate > schedule.endDate) return false;
-      if (schedule.recurringDays.length > 0 && !schedule.recurringDays.includes(currentDay)) return false;
+  if (activeSchedules.length > 0) {
+    // Merge playlists from ALL active schedules
+    const allPlaylistIds = activeSchedules.flatMap(s => s.playlistIds);
+    activePlaylists = playlists.filter(p => allPlaylistIds.includes(p.id));
 
-      return schedule.timeSlots.some(slot =>
-        currentTime >= slot.startTime && currentTime <= slot.endTime
-      );
+    playlistMedia = activePlaylists.flatMap(currentPlaylist => {
+      if (!currentPlaylist.mediaItems) return [];
+
+      return currentPlaylist.mediaItems.flatMap(item => {
+        let mediaId, duration;
+
+        if (typeof item === 'string') {
+          mediaId = item;
+          duration = 5;
+        } else {
+          mediaId = item.mediaId;
+          duration = item.duration || 5;
+        }
+
+        const mediaItem = media.find(m => m.id === mediaId);
+        if (!mediaItem) return [];
+
+        if (mediaItem.type === 'document-group') {
+          return mediaItem.pages.map(pageId => {
+            const pageItem = media.find(p => p.id === pageId);
+            return pageItem ? { ...pageItem, playlistDuration: duration } : null;
+          }).filter(Boolean);
+        }
+
+        return { ...mediaItem, playlistDuration: duration };
+      }).filter(Boolean);
     });
+  }
 
-    let activePlaylists = [];
-    let playlistMedia = [];
+  // ENHANCED: Include full chyron settings
+  const response = {
+    playerId,
+    currentSchedule: activeSchedules[0] || null,
+    playlists: activePlaylists,
+    media: playlistMedia,
+    chyronText: settings.chyronText || "",
+    chyronEnabled: settings.chyronEnabled !== undefined ? settings.chyronEnabled : true,
+    chyronSpeed: settings.chyronSpeed || 2,
+    contentHash: JSON.stringify(playlistMedia.length + (settings.chyronText || '').length + (settings.chyronEnabled ? 1 : 0) + (settings.chyronSpeed || 2))
+  };
 
-    if (activeSchedules.length > 0) {
-      // Merge playlists from ALL active schedules
-      const allPlaylistIds = activeSchedules.flatMap(s => s.playlistIds);
-      activePlaylists = playlists.filter(p => allPlaylistIds.includes(p.id));
+  const etag = `"${crypto.createHash('sha1').update(JSON.stringify(response)).digest('hex')}"`;
+  return { response, etag, activePlaylists };
+}
 
-      playlistMedia = activePlaylists.flatMap(currentPlaylist => {
-        if (!currentPlaylist.mediaItems) return [];
+// Long-poll waiters, released by notifyPlayersOfContentChange()
+const scheduleWaiters = new Set();
 
-        return currentPlaylist.mediaItems.flatMap(item => {
-          let mediaId, duration;
+function waitForContentChange(timeoutMs, req) {
+  return new Promise(resolve => {
+    const done = () => {
+      clearTimeout(timer);
+      scheduleWaiters.delete(done);
+      resolve();
+    };
+    const timer = setTimeout(done, timeoutMs);
+    scheduleWaiters.add(done);
+    req.on('close', done);
+  });
+}
 
-          if (typeof item === 'string') {
-            mediaId = item;
-            duration = 5;
-          } else {
-            mediaId = item.mediaId;
-            duration = item.duration || 5;
-          }
+function releaseScheduleWaiters() {
+  // Copy first: each waiter removes itself from the set
+  [...scheduleWaiters].forEach(done => done());
+}
 
-          const mediaItem = media.find(m => m.id === mediaId);
-          if (!mediaItem) return [];
+// Last schedule version each player is known to hold (from HTTP or a push),
+// used as the base for pushed patches
+const scheduleSent = new Map();
 
-          if (mediaItem.type === 'document-group') {
-            return mediaItem.pages.map(pageId => {
-              const pageItem = media.find(p => p.id === pageId);
-              return pageItem ? { ...pageItem, playlistDuration: duration } : null;
-            }).filter(Boolean);
-          }
+// Push changed schedules over the WebSocket instead of having every player
+// re-fetch. Players whose schedule did not change get nothing; the rest get
+// a top-level patch against the version they hold, or the full schedule when
+// that is smaller. A player whose version differs falls back to HTTP.
+async function pushSchedulesToPlayers() {
+  const pushPlayers = [...playerConnections].filter(([, ws]) => ws.playerData?.schedulePush && ws.readyState === ws.OPEN);
+  if (pushPlayers.length === 0) return;
+
+  const inputs = await loadScheduleInputs();
+  const { istDate } = getISTDateTime();
+  const serverTime = istDate.toISOString();
+
+  for (const [playerId, ws] of pushPlayers) {
+    const { response, etag } = await buildPlayerSchedule(playerId, inputs);
+    const last = scheduleSent.get(playerId);
+    if (last?.etag === etag) continue;
+
+    const full = { type: 'schedule-update', version: etag, schedule: { ...response, serverTime } };
+    let message = full;
+    if (last) {
+      const patch = {};
+      for (const [key, value] of Object.entries(response)) {
+        if (JSON.stringify(value) !== JSON.stringify(last.response[key])) patch[key] = value;
+      }
+      const removed = Object.keys(last.response).filter(key => !(key in response));
+      const patchMessage = { type: 'schedule-patch', baseVersion: last.etag, version: etag, patch, removed };
+      if (JSON.stringify(patchMessage).length < JSON.stringify(full).length) message = patchMessage;
+    }
+
+    scheduleSent.set(playerId, { etag, response });
+    ws.send(JSON.stringify(message));
+  }
+  console.log(`📡 Pushed schedules to ${pushPlayers.length} player(s)`);
+}
+
+// Pushes run one at a time so an older build can never overtake a newer one
+let schedulePushChain = Promise.resolve();
+
+function queueSchedulePush() {
+  schedulePushChain = schedulePushChain
+    .then(pushSchedulesToPlayers)
+    .catch(error => console.error('Error pushing schedules:', error));
+}
+
+// Time slots start and end without anyone editing anything, so nothing else
+// would tell players: the next boundary of any active schedule (a slot's
+// start, the minute after its end, or midnight for day/date rules) gets a
+// timer that notifies players as if the content had been edited.
+const SLOT_BOUNDARY_GRACE_MS = 1000;
+let slotBoundaryTimer = null;
+
+function timeToMinutes(time) {
+  const [hours, minutes] = time.split(':').map(Number);
+  // toLocaleTimeString with hour12: false reports the midnight hour as 24
+  return (hours % 24) * 60 + minutes;
+}
 
-          return { ...mediaItem, playlistDuration: duration };
-        }).filter(Boolean);
+async function armSlotBoundaryTimer() {
+  try {
+    const schedules = await loadSchedules();
+    const { istDate, currentTime } = getISTDateTime();
+    const now = timeToMinutes(currentTime);
+
+    let next = 24 * 60;
+    schedules.filter(schedule => schedule.isActive).forEach(schedule => {
+      (schedule.timeSlots || []).forEach(slot => {
+        [timeToMinutes(slot.startTime), timeToMinutes(slot.endTime) + 1].forEach(boundary => {
+          if (boundary > now && boundary < next) next = boundary;
+        });
       });
+    });
+
+    const delayMs = ((next - now) * 60 - istDate.getSeconds()) * 1000 + SLOT_BOUNDARY_GRACE_MS;
+    clearTimeout(slotBoundaryTimer);
+    slotBoundaryTimer = setTimeout(() => {
+      console.log('🕒 Time slot boundary reached');
+      notifyPlayersOfContentChange();
+    }, delayMs);
+    slotBoundaryTimer.unref();
+  } catch (error) {
+    console.error('Error arming time slot timer:', error);
+  }
+}
+
+const MAX_SCHEDULE_WAIT_SECONDS = 60;
+
+// ENHANCED Get player schedule - INCLUDES CHYRON SETTINGS
+// Supports conditional requests (If-None-Match -> 304) and long polling via
+// ?wait=<seconds>, which holds an unchanged request until content changes.
+app.get('/player-schedule/:playerId', async (req, res) => {
+  try {
+    const playerId = req.params.playerId;
+    const token = req.headers.authorization?.replace('Bearer ', '');
+
+    if (token && !await validatePlayerToken(playerId, token)) {
+      return res.status(401).json({ error: 'Invalid token' });
+    }
+
+    const ifNoneMatch = req.headers['if-none-match'];
+    const wait = Math.min(parseInt(req.query.wait, 10) || 0, MAX_SCHEDULE_WAIT_SECONDS);
+
+    let schedule = await buildPlayerSchedule(playerId);
+    if (wait > 0 && ifNoneMatch === schedule.etag) {
+      await waitForContentChange(wait * 1000, req);
+      if (req.destroyed) return;
+      schedule = await buildPlayerSchedule(playerId);
     }
 
+    const { response, etag, activePlaylists } = schedule;
+
     // Save current playlists for this player
     const players = await loadPlayers();
     const playerIndex = players.findIndex(p => p.id === playerId);
@@ -1030,27 +1232,21 @@ app.get('/player-schedule/:playerId', async (req, res) => {
       await savePlayers(players);
     }
 
-    // ENHANCED: Include full chyron settings
-    const response = {
-      playerId,
-      currentSchedule: activeSchedules[0] || null,
-      playlists: activePlaylists,
-      media: playlistMedia,
-      chyronText: settings.chyronText || "",
-      chyronEnabled: settings.chyronEnabled !== undefined ? settings.chyronEnabled : true,
-      chyronSpeed: settings.chyronSpeed || 2,
-      serverTime: istDate.toISOString(),
-      contentHash: JSON.stringify(playlistMedia.length + (settings.chyronText || '').length + (settings.chyronEnabled ? 1 : 0) + (settings.chyronSpeed || 2))
-    };
-
+    scheduleSent.set(playerId, { etag, response });
+    res.set('ETag', etag);
+    res.set('Cache-Control', 'no-cache');
+    if (ifNoneMatch === etag) {
+      return res.status(304).end();
+    }
 
     console.log(`📤 Sending schedule to ${playerId}:`, {
-      media: playlistMedia.length,
-      chyron: settings.chyronText ? 'YES' : 'NO',
+      media: response.media.length,
+      chyron: response.chyronText ? 'YES' : 'NO',
       enabled: response.chyronEnabled
     });
 
-    res.json(response);
+    const { istDate } = getISTDateTime();
+    res.json({ ...response, serverTime: istDate.toISOString() });
 
   } catch (error) {
     console.error('Error fetching player schedule:', error);
@@ -1059,6 +1255,11 @@ app.get('/player-schedule/:playerId', async (req, res) => {
 });
 
 
+// Cheap liveness endpoint, probed by players to rank CMS/edge servers by latency
+app.get('/health', (req, res) => {
+  res.json({ status: 'ok', uptime: process.uptime() });
+});
+
 // Stats endpoint
 app.get('/stats', async (req, res) => {
   const [media, playlists, schedules, players] = await Promise.all([
@@ -1082,9 +1283,25 @@ app.get('/stats', async (req, res) => {
   res.json(stats);
 });
 
+// Keepalive: terminate sockets that stop answering pings (players reconnect with backoff)
+const WS_KEEPALIVE_MS = 30000;
+const wsKeepalive = setInterval(() => {
+  wss.clients.forEach(ws => {
+    if (ws.isAlive === false) {
+      ws.terminate();
+      return;
+    }
+    ws.isAlive = false;
+    ws.ping();
+  });
+}, WS_KEEPALIVE_MS);
+wss.on('close', () => clearInterval(wsKeepalive));
+
 // ENHANCED WEBSOCKET CONNECTION HANDLING
 wss.on('connection', (ws, req) => {
   console.log('📡 WebSocket client connected');
+  ws.isAlive = true;
+  ws.on('pong', () => { ws.isAlive = true; });
 
   ws.on('message', async (data) => {
     try {
@@ -1093,7 +1310,11 @@ wss.on('connection', (ws, req) => {
       switch (message.type) {
         case 'player-connect':
           if (await validatePlayerToken(message.playerId, message.token)) {
-            ws.playerData = { type: 'player', playerId: message.playerId };
+            ws.playerData = {
+              type: 'player',
+              playerId: message.playerId,
+              schedulePush: Array.isArray(message.capabilities) && message.capabilities.includes('schedule-push')
+            };
             playerConnections.set(message.playerId, ws);
 
             const players = await loadPlayers();
@@ -1150,6 +1371,14 @@ wss.on('connection', (ws, req) => {
           }
           break;
 
+        case 'player-state-batch':
+          // Coalesced playback states sent by the player's state reporter
+          if (ws.playerData?.type === 'player' && Array.isArray(message.states)) {
+            const baseUrl = `http://${req.headers.host}`;
+            message.states.forEach(state => updatePlayerState(ws.playerData.playerId, state, baseUrl));
+          }
+          break;
+
         case 'player-status':
           if (ws.playerData?.type === 'player') {
             broadcastToCMS({
@@ -1169,6 +1398,7 @@ wss.on('connection', (ws, req) => {
     if (ws.playerData?.type === 'player') {
       const playerId = ws.playerData.playerId;
       playerConnections.delete(playerId);
+      scheduleSent.delete(playerId);
 
       const players = await loadPlayers();
       const playerIndex = players.findIndex(p => p.id === playerId);
@@ -1209,4 +1439,6 @@ server.listen(PORT, '0.0.0.0', () => {
   console.log(`🌐 Server timezone: ${process.env.TZ} (UTC${new Date().getTimezoneOffset() / -60})`);
   const { istDate } = getISTDateTime();
   console.log(`⏰ Current IST time: ${istDate.toISOString()}`);
+  armSlotBoundaryTimer();
+  backfillMediaChecksums().catch(err => console.error('Checksum backfill failed:', err));
 });
\ No newline at end of file
@@ -0,0 +1,120 @@
+# array_compositor.py
+from functools import lru_cache
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from frame_renderer import LOGO_MARGIN, _load_logo, fit_size, frame_buffer
+
+# cv2.imread flags that let libjpeg scale by 1/2, 1/4 or 1/8 while decoding.
+# EXIF orientation is ignored, as in the Pillow path.
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+    (1, cv2.IMREAD_COLOR)
+)
+SCRATCH_SLOTS = 4
+
+
+class ArrayFrameBuffer:
+    """Preallocated screen-sized RGBX frame as a NumPy array.
+
+    The resize lands in a reused scratch array and is colour-converted
+    straight into the letterbox region; only the bars around it are cleared.
+    The finished array is in the frame file's raw RGBX layout.
+    """
+
+    def __init__(self, size):
+        width, height = size
+        self.size = size
+        self.pixels = np.zeros((height, width, 4), dtype=np.uint8)
+        self.pixels[..., 3] = 255
+        self.scratch = {}
+
+    def _scratch(self, shape):
+        scratch = self.scratch.get(shape)
+        if scratch is None:
+            if len(self.scratch) >= SCRATCH_SLOTS:
+                self.scratch.clear()
+            scratch = self.scratch[shape] = np.empty(shape, dtype=np.uint8)
+        return scratch
+
+    def compose(self, bgr, logo=None):
+        height, width = self.pixels.shape[:2]
+        fit_width, fit_height = fit_size((bgr.shape[1], bgr.shape[0]), self.size)
+        left, top = (width - fit_width) // 2, (height - fit_height) // 2
+        right, bottom = left + fit_width, top + fit_height
+
+        rgb = self.pixels[..., :3]
+        rgb[:top] = 0
+        rgb[bottom:] = 0
+        rgb[top:bottom, :left] = 0
+        rgb[top:bottom, right:] = 0
+
+        region = self.pixels[top:bottom, left:right]
+        if (fit_width, fit_height) == (bgr.shape[1], bgr.shape[0]):
+            cv2.cvtColor(bgr, cv2.COLOR_BGR2RGBA, dst=region)
+        else:
+            # INTER_AREA averages source pixels: no aliasing on downscales
+            shrinking = fit_width < bgr.shape[1]
+            scaled = cv2.resize(bgr, (fit_width, fit_height), dst=self._scratch((fit_height, fit_width, 3)),
+                                interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LANCZOS4)
+            cv2.cvtColor(scaled, cv2.COLOR_BGR2RGBA, dst=region)
+
+        if logo is not None:
+            blend_logo(self.pixels, logo)
+        return self.pixels
+
+
+@lru_cache(maxsize=4)
+def load_logo_arrays(logo_path, logo_mtime, logo_height):
+    """The logo as premultiplied RGB and inverse alpha, ready for blending"""
+    rgba = np.asarray(_load_logo(logo_path, logo_mtime, logo_height), dtype=np.uint16)
+    alpha = rgba[..., 3:4]
+    premultiplied = rgba[..., :3] * alpha + 127
+    return premultiplied, 255 - alpha, np.empty(premultiplied.shape, dtype=np.uint16)
+
+
+def blend_logo(pixels, logo):
+    """Alpha-blend the logo into the top-right corner, in place"""
+    premultiplied, inverse_alpha, scratch = logo
+    logo_height, logo_width = premultiplied.shape[:2]
+    width = pixels.shape[1]
+    left = width - logo_width - LOGO_MARGIN
+    region = pixels[LOGO_MARGIN:LOGO_MARGIN + logo_height, max(0, left):left + logo_width, :3]
+    if region.shape[:2] != (logo_height, logo_width):
+        return  # screen too small for the logo
+    np.multiply(region, inverse_alpha, out=scratch)
+    scratch += premultiplied
+    scratch //= 255
+    region[...] = scratch
+
+
+def decode_reduced(image_path, content_size):
+    """BGR array decoded as small as possible while still covering the fitted size.
+
+    Returns None for formats OpenCV cannot read (the caller falls back to Pillow).
+    """
+    with Image.open(image_path) as img:
+        source_size, is_jpeg = img.size, img.format == 'JPEG'
+    fit_width, fit_height = fit_size(source_size, content_size)
+
+    flags = cv2.IMREAD_COLOR
+    if is_jpeg:
+        for scale, reduced_flags in REDUCED_DECODE_FLAGS:
+            if -(-source_size[0] // scale) >= fit_width and -(-source_size[1] // scale) >= fit_height:
+                flags = reduced_flags
+                break
+    return cv2.imread(image_path, flags | cv2.IMREAD_IGNORE_ORIENTATION)
+
+
+def compose_frame(image_path, content_size, logo_path, logo_mtime, logo_height):
+    """Render a frame as a raw RGBX array; None if OpenCV cannot decode the image"""
+    bgr = decode_reduced(image_path, content_size)
+    if bgr is None:
+        return None
+    buffer = frame_buffer(content_size, ArrayFrameBuffer)
+    logo = load_logo_arrays(logo_path, logo_mtime, logo_height) if logo_path else None
+    return buffer.compose(bgr, logo)
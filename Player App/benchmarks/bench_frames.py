@@ -0,0 +1,109 @@
+# bench_frames.py
+"""Per-slide cost of turning a source image into a display-ready frame.
+
+Compares the original process_image pipeline (convert, resize, new canvas,
+paste, logo paste, PNG frame file, PNG decode) with the current one (reduced
+decode at target size, reusable frame buffer, raw frame file mapped into
+memory) on both compositing engines -- Pillow and NumPy/OpenCV -- at 1080p
+and 4K.
+
+    python benchmarks/bench_frames.py --iterations 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PLAYER_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PLAYER_DIR)
+
+from PIL import Image
+
+from frame_renderer import FRAME_FORMAT, _load_logo, array_engine, composite_logo, map_frame, render_image_frame
+from fake_cms import build_library, parse_size
+from bench_player import percentile
+
+LOGO_PATH = os.path.join(PLAYER_DIR, "KIDS Logo.png")
+TICKER_HEIGHT = 60
+
+
+def legacy_frame(image_path, content_size, logo, frame_path):
+    """process_image before the zero-copy path, kept here as the reference"""
+    content_width, content_height = content_size
+    with Image.open(image_path) as img:
+        img = img.convert('RGB')
+        img_ratio = img.width / img.height
+        if img_ratio > content_width / content_height:
+            new_width, new_height = content_width, int(content_width / img_ratio)
+        else:
+            new_width, new_height = int(content_height * img_ratio), content_height
+        img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        final_image = Image.new('RGB', (content_width, content_height), 'black')
+        final_image.paste(img_resized, ((content_width - new_width) // 2, (content_height - new_height) // 2))
+    if logo:
+        composite_logo(final_image, logo)
+    final_image.save(frame_path, format='PNG', compress_level=1)
+
+    frame = Image.open(frame_path)
+    frame.load()
+    # What ImageTk.PhotoImage hands to Tk: the decoded RGB block as is
+    return frame
+
+
+def current_frame(image_path, content_size, logo_args, frame_path, engine):
+    render_image_frame(image_path, content_size, *logo_args, frame_path, engine)
+    frame = map_frame(frame_path, content_size)
+    # ImageTk.PhotoImage converts the mapped RGBX frame into an RGB block once
+    return frame.convert('RGB')
+
+
+def measure(fn, images, iterations, *args):
+    fn(images[0], *args)  # warm up page cache and lazy imports
+    samples = []
+    for _ in range(iterations):
+        for image_path in images:
+            started = time.perf_counter()
+            fn(image_path, *args)
+            samples.append(time.perf_counter() - started)
+    return percentile(samples, 50) * 1000, percentile(samples, 95) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare frame pipelines per slide at 1080p and 4K")
+    parser.add_argument('--images', type=int, default=4)
+    parser.add_argument('--image-size', type=parse_size, default=(3840, 2160))
+    parser.add_argument('--screens', type=parse_size, nargs='+', default=[(1920, 1080), (3840, 2160)])
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--media-dir', default=os.path.join(BENCH_DIR, 'media'))
+    args = parser.parse_args()
+
+    media = build_library(args.media_dir, args.images, args.image_size, videos=0, texts=0)
+    images = [os.path.join(args.media_dir, item['name']) for item in media]
+    logo_mtime = os.path.getmtime(LOGO_PATH) if os.path.exists(LOGO_PATH) else None
+    logo_path = LOGO_PATH if logo_mtime else None
+
+    print(f"{len(images)} source images at {args.image_size[0]}x{args.image_size[1]}, {args.iterations} iteration(s)")
+    engines = ['pillow'] + (['numpy'] if array_engine() else [])
+    if not array_engine():
+        print("⚠️ numpy/opencv not installed: NumPy engine skipped")
+    print(f"\n{'screen':>10} {'pipeline':>9} {'p50 ms':>9} {'p95 ms':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory(prefix="frame-bench-") as work_dir:
+        for screen_width, screen_height in args.screens:
+            content_size = (screen_width, screen_height - TICKER_HEIGHT)
+            logo_height = int(screen_height * 0.08)
+            logo = _load_logo(logo_path, logo_mtime, logo_height) if logo_path else None
+            label = f"{screen_width}x{screen_height}"
+
+            legacy = measure(legacy_frame, images, args.iterations, content_size, logo, os.path.join(work_dir, "legacy.png"))
+            print(f"{label:>10} {'legacy':>9} {legacy[0]:>9.1f} {legacy[1]:>9.1f}")
+            for engine in engines:
+                # 'auto' picks NumPy/OpenCV when it is importable
+                current = measure(current_frame, images, args.iterations, content_size, (logo_path, logo_mtime, logo_height),
+                                  os.path.join(work_dir, "current" + FRAME_FORMAT), 'pillow' if engine == 'pillow' else 'auto')
+                print(f"{label:>10} {engine:>9} {current[0]:>9.1f} {current[1]:>9.1f} {legacy[0] / current[0]:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
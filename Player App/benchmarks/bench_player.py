@@ -0,0 +1,304 @@
+# bench_player.py
+"""Reproducible performance benchmark for the player pipeline.
+
+Starts a local fake CMS (see fake_cms.py) and drives the player's own code
+headlessly -- no Tk window, no VLC output:
+
+  connect   register + authenticate (UltraPlayerManager)
+  schedule  full and conditional (304) schedule fetches (fetch_schedule)
+  sync      cold sync that downloads everything, then a warm one from cache (prepare_content)
+  image     per-slide letterbox + logo + decode, and render pool throughput (process_image's work)
+  text      text slide rendering (display_text's work)
+
+Reports latency percentiles, throughput and peak RSS, and compares them with
+baseline.json. Numbers are only comparable on the same machine and scenario:
+re-record the baseline on the reference player after an intended change.
+
+    python benchmarks/bench_player.py                    # run and compare
+    python benchmarks/bench_player.py --save-baseline    # record a new baseline
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PLAYER_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PLAYER_DIR)
+
+import playerapp
+from playerapp import UltraDisplayApp, UltraPlayerManager
+from frame_renderer import FRAME_FORMAT, map_frame, render_image_frame
+from fake_cms import FakeCms, build_library, parse_size
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_TOLERANCE = 0.20
+# Timer and scheduler jitter: smaller differences never count as regressions
+NOISE_FLOOR_MS = 5.0
+# Text slides are cheap; take more samples so the tail percentiles mean something
+TEXT_SAMPLES_PER_ITERATION = 10
+
+
+class HeadlessPlayer(UltraDisplayApp):
+    """UltraDisplayApp's sync, download and render pipeline without a Tk root.
+
+    The pipeline comes from the app's own init_content_pipeline(); only the
+    Tk widgets, display backend and scheduler are left out.
+    """
+
+    def __init__(self, player_manager, screen_size):
+        self.root = None
+        self.is_destroying = False
+        self.player_manager = player_manager
+        self.metrics = player_manager.metrics
+        self.screen_width, self.screen_height = screen_size
+        self.TICKER_HEIGHT = 60
+        self.init_content_pipeline()
+
+    def notify_ui(self):
+        pass
+
+    def shutdown(self):
+        self.download_manager.shutdown()
+        self.frame_loader.shutdown(wait=False)
+        self.frame_renderer.shutdown()
+        self.player_manager.shutdown()
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (render pool workers not included)"""
+    if resource is None:
+        return None
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+class Results:
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better='lower'):
+        self.metrics[name] = {'value': round(value, 3), 'unit': unit, 'better': better}
+
+    def latencies(self, stage, samples):
+        for q in (50, 95, 99):
+            self.add(f"{stage}.p{q}_ms", percentile(samples, q) * 1000, 'ms')
+
+
+def bench_connect(app, results, iterations):
+    manager = app.player_manager
+    if not manager.ensure_registered():
+        raise RuntimeError("fake CMS rejected registration")
+    # A single registration is too noisy to compare; the last one's credentials are kept
+    results.latencies("connect.register", [timed(manager.register_player)[0] for _ in range(iterations)])
+    results.latencies("connect.auth", [timed(manager.authenticate)[0] for _ in range(iterations)])
+
+
+def bench_schedule(app, results, iterations):
+    full = []
+    for _ in range(iterations):
+        app.schedule_etag = None
+        app.schedule_digest_value = ""
+        full.append(timed(app.fetch_schedule)[0])
+    results.latencies("schedule.full", full)
+    results.latencies("schedule.not_modified", [timed(app.fetch_schedule)[0] for _ in range(iterations)])
+
+
+def bench_sync(app, results, cms):
+    schedule = app.latest_schedule
+    sent_before = cms.bytes_sent
+    seconds, _ = timed(app.prepare_content, schedule)
+    downloaded = cms.bytes_sent - sent_before
+    results.add("sync.cold_ms", seconds * 1000, 'ms')
+    results.add("sync.download_mbps", downloaded * 8 / 1000 / 1000 / seconds, 'Mbit/s', better='higher')
+
+    # Same schedule again after a restart: everything comes from the media cache
+    app.prepared_media_list = []
+    app.player_manager.last_content_hash = ""
+    seconds, _ = timed(app.prepare_content, schedule)
+    results.add("sync.warm_ms", seconds * 1000, 'ms')
+    return [item for item in app.prepared_media_list if item.get('type') == 'image']
+
+
+def bench_images(app, results, images, iterations, work_dir):
+    """The work process_image() pays for on a frame cache miss, slide by slide,
+    then the throughput of the render pool warming a whole playlist"""
+    size = app.content_size()
+    logo_path = os.path.abspath(playerapp.LOGO_PATH) if os.path.exists(playerapp.LOGO_PATH) else None
+    logo_mtime = os.path.getmtime(logo_path) if logo_path else None
+    frame_path = os.path.join(work_dir, "bench_frame" + FRAME_FORMAT)
+
+    # One untimed pass warms the page cache, logo cache and allocator
+    samples = []
+    for iteration in range(iterations + 1):
+        for item in images:
+            started = time.perf_counter()
+            render_image_frame(item['local_path'], size, logo_path, logo_mtime, app.frame_renderer.logo_height, frame_path)
+            with map_frame(frame_path, size) as frame:
+                frame.load()
+            if iteration:
+                samples.append(time.perf_counter() - started)
+            os.remove(frame_path)
+    results.latencies("image.process", samples)
+
+    # Spawn the pool workers before timing, as a running player already has
+    app.frame_renderer.render(images[0]['local_path'], (size[0] // 2, size[1] // 2))
+    started = time.perf_counter()
+    futures = [app.frame_renderer.submit(item['local_path'], size) for item in images]
+    for future in futures:
+        future.result()
+    results.add("image.pool_slides_per_s", len(images) / (time.perf_counter() - started), 'slides/s', better='higher')
+
+
+def bench_text(app, results, texts, iterations):
+    logo = app.player_manager.logo
+    samples = [timed(app.compositor.text_frame, text, logo)[0]
+               for _ in range(iterations * TEXT_SAMPLES_PER_ITERATION) for text in texts]
+    results.latencies("text.render", samples)
+
+
+def compare(results, baseline, tolerance):
+    """Print current vs baseline; return the names of metrics that regressed past tolerance"""
+    regressions = []
+    print(f"\n{'metric':34} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in sorted(results.items()):
+        base = baseline.get(name)
+        if not base or not base['value']:
+            print(f"{name:34} {'-':>12} {current['value']:>12} {'new':>8}")
+            continue
+        change = (current['value'] - base['value']) / base['value']
+        worse = change > tolerance if current['better'] == 'lower' else change < -tolerance
+        if current['unit'] == 'ms' and abs(current['value'] - base['value']) < NOISE_FLOOR_MS:
+            worse = False
+        if worse:
+            regressions.append(name)
+        print(f"{name:34} {base['value']:>12} {current['value']:>12} {change:>+8.0%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def run(args):
+    media_dir = os.path.abspath(args.media_dir)
+    media = build_library(media_dir, args.images, args.image_size, args.videos, int(args.video_mb * 1024 * 1024), args.texts)
+    cms = FakeCms(media_dir, media, latency=args.latency_ms / 1000, bandwidth_mbps=args.bandwidth_mbps).start()
+
+    # The player keeps its config, caches and schedule next to the working directory
+    work_dir = tempfile.mkdtemp(prefix="player-bench-")
+    logo_source = os.path.join(PLAYER_DIR, playerapp.LOGO_PATH)
+    if os.path.exists(logo_source):
+        shutil.copy(logo_source, work_dir)
+    with open(os.path.join(work_dir, playerapp.CONFIG_FILE), 'w') as f:
+        json.dump({
+            'name': 'Benchmark Player',
+            'location': 'Benchmark',
+            'backendUrl': cms.url,
+            'cmsDiscovery': False,
+            'decodeBenchmark': False,
+            'peerSharing': False,
+            'metricsPort': 0,
+            'downloadWorkers': args.download_workers
+        }, f)
+
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    app = None
+    results = Results()
+    try:
+        app = HeadlessPlayer(UltraPlayerManager(screen_size=args.screen), args.screen)
+        bench_connect(app, results, args.iterations)
+        bench_schedule(app, results, args.iterations)
+        images = bench_sync(app, results, cms)
+        if images:
+            bench_images(app, results, images, args.iterations, work_dir)
+        texts = [item['url'] for item in media if item['type'] == 'text']
+        if texts:
+            bench_text(app, results, texts, args.iterations)
+    finally:
+        if app:
+            app.shutdown()
+        cms.shutdown()
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    peak_rss = peak_rss_mb()
+    if peak_rss is not None:
+        results.add("memory.peak_rss_mb", peak_rss, 'MB')
+    return results.metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the player pipeline against a local fake CMS")
+    parser.add_argument('--images', type=int, default=6)
+    parser.add_argument('--image-size', type=parse_size, default=(3840, 2160))
+    parser.add_argument('--videos', type=int, default=1)
+    parser.add_argument('--video-mb', type=float, default=16)
+    parser.add_argument('--texts', type=int, default=2)
+    parser.add_argument('--screen', type=parse_size, default=(1920, 1080))
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--bandwidth-mbps', type=float, default=200)
+    parser.add_argument('--download-workers', type=int, default=4)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--media-dir', default=os.path.join(BENCH_DIR, 'media'))
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="Allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    scenario = {k: v for k, v in vars(args).items() if k not in ('media_dir', 'baseline', 'save_baseline', 'tolerance', 'json')}
+    results = run(args)
+    machine = f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU"
+    report = {'machine': machine, 'scenario': scenario, 'metrics': results}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\n📌 Baseline saved to {args.baseline}")
+        compare(results, {}, args.tolerance)
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            stored = json.load(f)
+        if stored.get('scenario') != json.loads(json.dumps(scenario)):
+            print("⚠️ Baseline was recorded with a different scenario; comparison is indicative only")
+        if stored.get('machine') != machine:
+            print(f"⚠️ Baseline was recorded on {stored.get('machine')}; comparison is indicative only")
+        baseline = stored.get('metrics', {})
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} metric(s) regressed more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
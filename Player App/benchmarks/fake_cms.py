@@ -0,0 +1,297 @@
+# fake_cms.py
+"""Local stand-in for the CMS backend, for benchmarks and offline testing.
+
+Serves the endpoints a player uses (register, auth, player-schedule with
+ETag/304, /uploads with Range, /health) from generated media, with a fixed
+per-request latency and a shared bandwidth cap to imitate a real link.
+
+    python benchmarks/fake_cms.py --port 4000 --latency-ms 50 --bandwidth-mbps 20
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+SEND_CHUNK_SIZE = 64 * 1024
+UPLOAD_PATH = re.compile(r'^/uploads/([\w.-]+)$')
+SCHEDULE_PATH = re.compile(r'^/player-schedule/([\w-]+)$')
+
+
+class Link:
+    """Bandwidth shared by every response, like one uplink into the venue"""
+
+    def __init__(self, bytes_per_second=None):
+        self.bytes_per_second = bytes_per_second
+        self.next_free = 0.0
+        self.lock = threading.Lock()
+
+    def send(self, wfile, data):
+        view = memoryview(data)
+        for start in range(0, len(view), SEND_CHUNK_SIZE):
+            chunk = view[start:start + SEND_CHUNK_SIZE]
+            if self.bytes_per_second:
+                with self.lock:
+                    begin = max(time.monotonic(), self.next_free)
+                    self.next_free = begin + len(chunk) / self.bytes_per_second
+                    done = self.next_free
+                delay = done - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            wfile.write(chunk)
+
+
+def generate_image(path, width, height, seed):
+    """Deterministic photo-like test image (gradients plus seeded noise), saved as JPEG"""
+    rng = random.Random(seed)
+    base = Image.merge('RGB', [
+        Image.linear_gradient('L').rotate(rng.randrange(360)).resize((width, height)),
+        Image.radial_gradient('L').resize((width, height)),
+        Image.linear_gradient('L').transpose(Image.Transpose.ROTATE_90).resize((width, height))
+    ])
+    noise = Image.frombytes('L', (width // 4, height // 4), rng.randbytes((width // 4) * (height // 4)))
+    base.paste(Image.merge('RGB', [noise] * 3).resize((width, height)), mask=noise.point(lambda v: v // 4).resize((width, height)))
+    base.save(path, format='JPEG', quality=90)
+
+
+def build_library(media_dir, images=8, image_size=(3840, 2160), videos=1, video_bytes=16 * 1024 * 1024, texts=2):
+    """Create the benchmark media once and describe it as CMS media items"""
+    os.makedirs(media_dir, exist_ok=True)
+    media = []
+
+    def add(name, media_type, **extra):
+        path = os.path.join(media_dir, name)
+        with open(path, 'rb') as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        media.append(dict({
+            'id': f"media-{len(media) + 1}",
+            'name': name,
+            'type': media_type,
+            'url': f"/uploads/{name}",
+            'fileSize': os.path.getsize(path),
+            'checksum': checksum,
+            'uploadedAt': '2024-01-01T00:00:00.000Z',
+            'playlistDuration': 5
+        }, **extra))
+
+    width, height = image_size
+    for i in range(images):
+        name = f"image_{i + 1}_{width}x{height}.jpg"
+        if not os.path.exists(os.path.join(media_dir, name)):
+            generate_image(os.path.join(media_dir, name), width, height, seed=i)
+        add(name, 'image')
+
+    for i in range(videos):
+        name = f"video_{i + 1}.mp4"
+        path = os.path.join(media_dir, name)
+        if not os.path.exists(path) or os.path.getsize(path) != video_bytes:
+            with open(path, 'wb') as f:
+                f.write(random.Random(1000 + i).randbytes(video_bytes))
+        add(name, 'video', playlistDuration=30)
+
+    for i in range(texts):
+        media.append({
+            'id': f"text-{i + 1}",
+            'name': f"Announcement {i + 1}",
+            'type': 'text',
+            # The player shows a text item's url field as the slide text
+            'url': ("Welcome to the innovation and design studio. " * (4 + 4 * i)).strip(),
+            'playlistDuration': 10
+        })
+    return media
+
+
+class FakeCms:
+    """Threaded HTTP server answering the player API from a fixed schedule"""
+
+    def __init__(self, media_dir, media, host='127.0.0.1', port=0, latency=0.0, bandwidth_mbps=None, ticker_text="Benchmark ticker"):
+        self.media_dir = media_dir
+        self.latency = latency
+        self.link = Link(bandwidth_mbps * 1000 * 1000 / 8 if bandwidth_mbps else None)
+        self.players = {}
+        self.requests = 0
+        self.bytes_sent = 0
+        self.stats_lock = threading.Lock()
+        self.set_schedule(media, ticker_text)
+
+        self.httpd = ThreadingHTTPServer((host, int(port)), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def set_schedule(self, media, ticker_text="Benchmark ticker"):
+        self.schedule = {
+            'currentSchedule': {'id': 'benchmark-schedule', 'name': 'Benchmark'},
+            'playlists': [{'id': 'benchmark-playlist', 'name': 'Benchmark'}],
+            'media': media,
+            'tickerText': ticker_text,
+            'tickerSpeed': 2
+        }
+        self.etag = f'"{hashlib.sha1(json.dumps(self.schedule, sort_keys=True).encode()).hexdigest()}"'
+
+    def _count(self, nbytes):
+        with self.stats_lock:
+            self.requests += 1
+            self.bytes_sent += nbytes
+
+    def _handler(self):
+        cms = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out as separate writes; don't let Nagle add 40 ms
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                cms.link.send(self.wfile, body)
+                cms._count(len(body))
+
+            def read_json(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    return json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    return {}
+
+            def do_POST(self):
+                time.sleep(cms.latency)
+                body = self.read_json()
+                if self.path == '/players/register':
+                    player_id, token = str(uuid.uuid4()), uuid.uuid4().hex
+                    cms.players[player_id] = token
+                    self.send_json(200, {'playerId': player_id, 'token': token})
+                elif self.path == '/players/auth':
+                    ok = cms.players.get(body.get('playerId')) == body.get('token')
+                    self.send_json(200 if ok else 401, {'success': ok})
+                else:
+                    # Heartbeats, playback state and anything else the player posts
+                    self.send_json(200, {'success': True})
+
+            def do_GET(self):
+                time.sleep(cms.latency)
+                path = self.path.split('?', 1)[0]
+                if path == '/health':
+                    self.send_json(200, {'status': 'ok'})
+                    return
+
+                match = SCHEDULE_PATH.match(path)
+                if match:
+                    token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+                    if cms.players.get(match.group(1)) != token:
+                        self.send_json(401, {'error': 'Unauthorized'})
+                    elif self.headers.get('If-None-Match') == cms.etag:
+                        self.send_response(304)
+                        self.send_header('ETag', cms.etag)
+                        self.end_headers()
+                        cms._count(0)
+                    else:
+                        body = json.dumps(dict(cms.schedule, playerId=match.group(1))).encode()
+                        self.send_response(200)
+                        self.send_header('Content-Type', 'application/json')
+                        self.send_header('Content-Length', str(len(body)))
+                        self.send_header('ETag', cms.etag)
+                        self.end_headers()
+                        cms.link.send(self.wfile, body)
+                        cms._count(len(body))
+                    return
+
+                match = UPLOAD_PATH.match(path)
+                file_path = os.path.join(cms.media_dir, match.group(1)) if match else None
+                if not file_path or not os.path.isfile(file_path):
+                    self.send_json(404, {'error': 'Not found'})
+                    return
+                self.send_file(file_path)
+
+            def send_file(self, file_path):
+                size = os.path.getsize(file_path)
+                offset = 0
+                range_match = re.match(r'^bytes=(\d+)-$', self.headers.get('Range', ''))
+                if range_match:
+                    offset = int(range_match.group(1))
+                    if offset >= size:
+                        self.send_response(416)
+                        self.send_header('Content-Range', f"bytes */{size}")
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {offset}-{size - 1}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(size - offset))
+                self.end_headers()
+                sent = 0
+                with open(file_path, 'rb') as f:
+                    f.seek(offset)
+                    try:
+                        while chunk := f.read(SEND_CHUNK_SIZE):
+                            cms.link.send(self.wfile, chunk)
+                            sent += len(chunk)
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+                cms._count(sent)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def parse_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fixed schedule to players, with simulated latency and bandwidth")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4000)
+    parser.add_argument('--media-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'media'))
+    parser.add_argument('--images', type=int, default=8)
+    parser.add_argument('--image-size', type=parse_size, default=(3840, 2160))
+    parser.add_argument('--videos', type=int, default=1)
+    parser.add_argument('--video-mb', type=float, default=16)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--bandwidth-mbps', type=float, default=None)
+    args = parser.parse_args()
+
+    media = build_library(args.media_dir, args.images, args.image_size, args.videos, int(args.video_mb * 1024 * 1024))
+    cms = FakeCms(args.media_dir, media, args.host, args.port, args.latency_ms / 1000, args.bandwidth_mbps).start()
+    print(f"Fake CMS serving {len(media)} media items at {cms.url}")
+    try:
+        cms.thread.join()
+    except KeyboardInterrupt:
+        cms.shutdown()
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# compositor.py
+import os
+
+from PIL import Image
+
+from frame_renderer import map_frame, render_text_slide, render_ticker_strip
+
+TICKER_BACKGROUND_ALPHA = 128
+
+
+class Compositor:
+    """Builds every still picture the player shows, as plain PIL images.
+
+    Knows the screen geometry (content area above the ticker band) and how
+    slides, text and the ticker are drawn, but nothing about the toolkit that
+    puts them on screen: a display backend turns the frames into its own
+    surfaces. Image frames come from the FrameRenderer's on-disk cache.
+    """
+
+    def __init__(self, frame_renderer, screen_size, ticker_height):
+        self.frame_renderer = frame_renderer
+        self.screen_width, self.screen_height = screen_size
+        self.ticker_height = ticker_height
+
+    def content_size(self):
+        return (self.screen_width, self.screen_height - self.ticker_height)
+
+    def image_frame(self, image_path, size=None):
+        """Letterboxed, logo-stamped frame for an image (renders on a cache miss).
+
+        The frame is the rendered file mapped into memory, not a decoded copy;
+        backends copy it once into their own surface.
+        """
+        size = size or self.content_size()
+        frame_path = self.frame_renderer.render(image_path, size)
+        try:
+            return map_frame(frame_path, size)
+        except ValueError:
+            # Truncated or foreign file: render it again
+            os.remove(frame_path)
+            return map_frame(self.frame_renderer.render(image_path, size), size)
+
+    def text_frame(self, text, logo=None):
+        return render_text_slide(text, self.content_size(), logo)
+
+    def ticker_font_size(self):
+        return max(16, int(self.screen_height * 0.04))
+
+    def ticker_strip(self, text):
+        """Ticker text rendered once; backends scroll this strip instead of redrawing text"""
+        return render_ticker_strip(text, self.ticker_font_size(), self.ticker_height)
+
+    def ticker_background(self, alpha=TICKER_BACKGROUND_ALPHA):
+        return Image.new('RGBA', (self.screen_width, self.ticker_height), (0, 0, 0, alpha))
@@ -0,0 +1,82 @@
+# deadline_scheduler.py
+import heapq
+import itertools
+import time
+
+
+class DeadlineScheduler:
+    """Heap of named deadlines driven by a single Tk after() timer.
+
+    Each concern (media expiry, heartbeat, logo check, ...) owns one named
+    deadline. Scheduling a name again replaces its previous deadline. The Tk
+    timer is always armed for the earliest deadline only, so the UI thread
+    sleeps until work is actually due.
+    """
+
+    def __init__(self, root, observer=None):
+        self.root = root
+        # observer(name, lateness, duration): timing of every task run, in seconds
+        self.observer = observer
+        self.heap = []
+        self.entries = {}
+        self.counter = itertools.count()
+        self.after_id = None
+        self.armed_at = None
+        self.stopped = False
+
+    def schedule(self, name, delay, callback):
+        """Run callback once, delay seconds from now, replacing any pending deadline for name"""
+        self.cancel(name)
+        deadline = time.monotonic() + max(0.0, delay)
+        entry = [deadline, next(self.counter), name, callback]
+        self.entries[name] = entry
+        heapq.heappush(self.heap, entry)
+        if self.armed_at is None or deadline < self.armed_at:
+            self._arm()
+
+    def cancel(self, name):
+        entry = self.entries.pop(name, None)
+        if entry:
+            # Lazy deletion: the heap entry is skipped when it surfaces
+            entry[3] = None
+
+    def _arm(self):
+        if self.after_id:
+            try:
+                self.root.after_cancel(self.after_id)
+            except Exception:
+                pass
+            self.after_id = None
+            self.armed_at = None
+
+        while self.heap and self.heap[0][3] is None:
+            heapq.heappop(self.heap)
+        if self.stopped or not self.heap:
+            return
+
+        deadline = self.heap[0][0]
+        delay_ms = max(0, int((deadline - time.monotonic()) * 1000 + 0.999))
+        self.armed_at = deadline
+        self.after_id = self.root.after(delay_ms, self._fire)
+
+    def _fire(self):
+        self.after_id = None
+        self.armed_at = None
+        now = time.monotonic()
+        while self.heap and self.heap[0][0] <= now:
+            deadline, _, name, callback = heapq.heappop(self.heap)
+            if callback is None:
+                continue
+            del self.entries[name]
+            started = time.monotonic()
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in scheduled task '{name}': {e}")
+            if self.observer:
+                self.observer(name, started - deadline, time.monotonic() - started)
+        self._arm()
+
+    def stop(self):
+        self.stopped = True
+        self._arm()
@@ -0,0 +1,300 @@
+# decode_profile.py
+import glob
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import threading
+import time
+from functools import lru_cache
+
+import vlc
+
+CODECS = ('hevc', 'h264')
+FFMPEG_ENCODERS = {'hevc': 'libx265', 'h264': 'libx264'}
+RESOLUTION_LADDER = (2160, 1440, 1080, 720)
+
+BENCHMARK_SECONDS = 3
+BENCHMARK_FPS = 30
+MAX_LOST_RATIO = 0.02
+# Decoders known to hold several streams at once (a pre-rolled clip and the playing one)
+MULTI_STREAM_ACCELS = ('nvdec', 'vaapi', 'd3d11va', 'dxva2', 'videotoolbox')
+
+
+def _run(cmd, timeout=10):
+    try:
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=timeout).stdout
+    except Exception:
+        return ""
+
+
+def vlc_version():
+    try:
+        return vlc.libvlc_get_version().decode(errors='replace')
+    except Exception:
+        return "unknown"
+
+
+@lru_cache(maxsize=1)
+def vaapi_profiles():
+    """VA-API profiles vainfo lists; empty when vainfo or a VA driver is missing"""
+    if not shutil.which('vainfo'):
+        return ()
+    return tuple(sorted(set(re.findall(r'VAProfile\w+', _run(['vainfo'])))))
+
+
+def probe_hw_accel():
+    """Hardware decode paths present on this machine, best first"""
+    system = platform.system()
+    if system == 'Windows':
+        return ['d3d11va', 'dxva2']
+    if system == 'Darwin':
+        return ['videotoolbox']
+
+    accels = []
+    if os.path.exists('/dev/nvidia0'):
+        accels.append('nvdec')
+    # A render node alone proves nothing: KMS boards such as the Raspberry Pi
+    # have one without any VA driver behind it
+    if glob.glob('/dev/dri/renderD*') and vaapi_profiles():
+        accels.append('vaapi')
+    # Raspberry Pi: H.264 through the V4L2 mem2mem decoder, HEVC through rpivid
+    if os.path.exists('/dev/video10') or os.path.exists('/dev/video19'):
+        accels.append('v4l2m2m')
+    return accels
+
+
+def probe_hw_codecs(accels):
+    """Codecs the hardware paths in accels claim to decode"""
+    codecs = set()
+    if 'vaapi' in accels:
+        profiles = vaapi_profiles()
+        if any(profile.startswith('VAProfileH264') for profile in profiles):
+            codecs.add('h264')
+        if any(profile.startswith('VAProfileHEVC') for profile in profiles):
+            codecs.add('hevc')
+    if any(accel in accels for accel in ('nvdec', 'd3d11va', 'dxva2', 'videotoolbox')):
+        codecs.update(('h264', 'hevc'))
+    if 'v4l2m2m' in accels:
+        if os.path.exists('/dev/video10'):
+            codecs.add('h264')
+        if os.path.exists('/dev/video19'):
+            codecs.add('hevc')
+    return sorted(codecs)
+
+
+def generate_benchmark_clip(path, codec, width, height):
+    """Encode a short synthetic test clip with ffmpeg; False if it cannot be made"""
+    if os.path.exists(path):
+        return True
+    if not shutil.which('ffmpeg'):
+        return False
+    tmp_path = path + '.tmp.mp4'
+    _run([
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate={BENCHMARK_FPS}',
+        '-t', str(BENCHMARK_SECONDS), '-c:v', FFMPEG_ENCODERS[codec], '-pix_fmt', 'yuv420p',
+        tmp_path
+    ], timeout=120)
+    if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def benchmark_clip(clip_path, hw_decode):
+    """Play clip_path in real time on a hidden VLC player and count late/lost frames"""
+    instance = vlc.Instance([
+        '--intf', 'dummy', '--vout', 'dummy', '--no-audio', '--quiet',
+        f'--avcodec-hw={hw_decode}'
+    ])
+    player = instance.media_player_new()
+    media = instance.media_new(clip_path)
+    player.set_media(media)
+    player.play()
+
+    deadline = time.monotonic() + BENCHMARK_SECONDS * 3 + 5
+    while time.monotonic() < deadline:
+        if player.get_state() in (vlc.State.Ended, vlc.State.Error):
+            break
+        time.sleep(0.1)
+
+    state = player.get_state()
+    stats = vlc.MediaStats()
+    media.get_stats(stats)
+    player.stop()
+    player.release()
+    instance.release()
+
+    decoded, lost = stats.decoded_video, stats.lost_pictures
+    return {
+        'decoded': decoded,
+        'lost': lost,
+        'ok': state == vlc.State.Ended and decoded > 0 and lost <= decoded * MAX_LOST_RATIO
+    }
+
+
+class DecodeProfile:
+    """What this player can decode smoothly, and which rendition to fetch.
+
+    The constructor probes the machine for hardware decode paths (cheap, runs
+    at startup). validate() plays a short local clip per codec and resolution
+    through VLC and keeps the highest resolution that decodes without dropping
+    frames. Validated results are cached in cache_path and reused until the
+    hardware, VLC version or screen size changes; a codec counts as validated
+    only once its test clip could be encoded and played.
+    """
+
+    def __init__(self, cache_path, clips_dir, screen_size):
+        self.cache_path = cache_path
+        self.clips_dir = clips_dir
+        self.screen_size = screen_size
+        self.lock = threading.Lock()
+
+        self.hw_accel = probe_hw_accel()
+        self.signature = f"{platform.machine()}|{vlc_version()}|{','.join(self.hw_accel)}|{screen_size[0]}x{screen_size[1]}"
+        self.profile = self._load() or {
+            'hwAccel': self.hw_accel,
+            'hwCodecs': probe_hw_codecs(self.hw_accel),
+            # Unvalidated: assume anything up to the screen height decodes
+            'maxHeight': {codec: screen_size[1] for codec in CODECS},
+            'validated': False
+        }
+
+    def _load(self):
+        try:
+            if os.path.exists(self.cache_path):
+                with open(self.cache_path, 'r') as f:
+                    cached = json.load(f)
+                if cached.get('signature') == self.signature:
+                    return cached['profile']
+        except Exception as e:
+            print(f"Failed to load decode profile: {e}")
+        return None
+
+    def _save(self):
+        try:
+            with open(self.cache_path, 'w') as f:
+                json.dump({'signature': self.signature, 'profile': self.profile}, f, indent=2)
+        except Exception as e:
+            print(f"Failed to save decode profile: {e}")
+
+    def summary(self):
+        with self.lock:
+            return dict(self.profile)
+
+    @property
+    def validated(self):
+        return self.profile.get('validated', False)
+
+    def hw_decode_flag(self):
+        """Value for VLC's --avcodec-hw"""
+        return 'any' if self.hw_accel else 'none'
+
+    def concurrent_decodes(self):
+        """Video streams the decoder holds at once: at least two for software
+        and known GPU decoders, one for the Raspberry Pi's V4L2 mem2mem
+        decoders and anything not known to do better"""
+        if not self.hw_accel or self.hw_accel[0] in MULTI_STREAM_ACCELS:
+            return 2
+        return 1
+
+    def validate(self, idle=None):
+        """Benchmark each codec down the resolution ladder; slow, run off the UI thread.
+
+        idle() is checked before every clip: once it returns False the run
+        stops and resumes on a later call. Each codec's result is saved as
+        soon as it is known, so an interruption only repeats the current
+        codec. A codec whose test clip cannot be encoded keeps its probed
+        limit and stays unvalidated. Returns the profile summary, or None if
+        the run was interrupted.
+        """
+        os.makedirs(self.clips_dir, exist_ok=True)
+        screen_height = self.screen_size[1]
+
+        for codec in CODECS:
+            with self.lock:
+                if codec in self.profile.get('validatedCodecs', []):
+                    continue
+            results = {}
+            for height in [h for h in RESOLUTION_LADDER if h <= max(screen_height, RESOLUTION_LADDER[-1])]:
+                if idle and not idle():
+                    print("⏸️ Decode benchmark paused until the player is idle again")
+                    return None
+                width = (height * 16 // 9) // 2 * 2
+                clip_path = os.path.join(self.clips_dir, f"{codec}_{height}p.mp4")
+                if not generate_benchmark_clip(clip_path, codec, width, height):
+                    print(f"⚠️ Cannot create {codec} benchmark clip, keeping probed profile")
+                    break
+                result = benchmark_clip(clip_path, self.hw_decode_flag())
+                results[f"{codec}_{height}p"] = result
+                if result['ok'] or height == RESOLUTION_LADDER[-1]:
+                    self._record(codec, height if result['ok'] else 0, results)
+                    print(f"🎞️ Decode profile validated for {codec}: up to {height if result['ok'] else 0}p")
+                    break
+
+        return self.summary()
+
+    def _record(self, codec, max_height, results):
+        """Store one codec's validated limit and benchmark results"""
+        with self.lock:
+            validated_codecs = self.profile.get('validatedCodecs', []) + [codec]
+            self.profile = dict(self.profile,
+                                maxHeight=dict(self.profile['maxHeight'], **{codec: max_height}),
+                                benchmark=dict(self.profile.get('benchmark', {}), **results),
+                                validatedCodecs=validated_codecs,
+                                validated=all(c in validated_codecs for c in CODECS))
+        self._save()
+
+    def can_decode(self, codec, height=None):
+        with self.lock:
+            limit = self.profile['maxHeight'].get(codec, 0)
+        return limit > 0 and (height is None or height <= limit)
+
+    def renditions(self, media_item):
+        """Every encoding of a video the CMS offers: (url, codec, height, checksum)"""
+        options = [(r['url'], r.get('codec', 'h264'), r.get('height'), r.get('checksum'))
+                   for r in media_item.get('renditions', []) if r.get('url')]
+        if media_item.get('h265_url'):
+            options.append((media_item['h265_url'], 'hevc', media_item.get('height'), media_item.get('h265_checksum')))
+        options.append((media_item['url'], media_item.get('codec', 'h264'), media_item.get('height'), media_item.get('checksum')))
+        return options
+
+    def choose_rendition(self, media_item):
+        """Return the media item to download: a copy pointing at the best
+        rendition this device decodes smoothly.
+
+        Preference: decodable, at least screen height but no larger than
+        needed, then HEVC over H.264 when HEVC decodes in hardware (smaller
+        downloads for the same quality). The original upload is the fallback.
+        The playlist item itself is left untouched, so playlist diffs keep
+        matching it.
+        """
+        if media_item.get('type') != 'video':
+            return media_item
+
+        target = self.screen_size[1]
+        with self.lock:
+            prefer_hevc = 'hevc' in self.profile.get('hwCodecs', [])
+
+        def score(option):
+            _, codec, height, _ = option
+            effective = height or target
+            return (
+                not self.can_decode(codec, height),
+                effective < target,
+                abs(effective - target),
+                (codec != 'hevc') if prefer_hevc else (codec == 'hevc')
+            )
+
+        url, codec, height, checksum = min(self.renditions(media_item), key=score)
+        if url == media_item['url']:
+            return media_item
+        source = dict(media_item, url=url)
+        # The upload checksum does not apply to a transcoded rendition
+        source.pop('checksum', None)
+        if checksum:
+            source['checksum'] = checksum
+        return source
@@ -0,0 +1,53 @@
+# display_backends.py
+
+# Tk photo images keep 4 bytes per pixel
+SURFACE_BYTES_PER_PIXEL = 4
+
+
+class TkBackend:
+    """Shows compositor frames in the app's Tk widgets.
+
+    Every frame becomes an ImageTk.PhotoImage; Tk keeps its own pixel store,
+    so that copy is the one a frame cannot avoid. The ticker is a background
+    and a text strip on a canvas, scrolled by moving the strip item.
+    """
+
+    def __init__(self, content_label, video_frame, ticker_canvas):
+        from PIL import ImageTk
+        self.ImageTk = ImageTk
+        self.content_label = content_label
+        self.video_frame = video_frame
+        self.ticker_canvas = ticker_canvas
+        self.ticker_images = []
+        self.ticker_item_id = None
+
+    def surface_bytes(self, size):
+        return size[0] * size[1] * SURFACE_BYTES_PER_PIXEL
+
+    def surface(self, frame):
+        return self.ImageTk.PhotoImage(frame)
+
+    def show(self, surface):
+        """Put surface in the content area; False if it was already on screen"""
+        if getattr(self.content_label, 'image', None) is surface and self.content_label.winfo_ismapped():
+            return False
+        self.video_frame.pack_forget()
+        self.content_label.configure(image=surface, text="")
+        self.content_label.image = surface
+        self.content_label.pack(fill='both', expand=True)
+        return True
+
+    def show_video(self):
+        """Hand the content area to the video surfaces"""
+        self.content_label.pack_forget()
+        self.video_frame.pack(fill='both', expand=True)
+
+    def set_ticker(self, background, strip, x):
+        self.ticker_canvas.delete("all")
+        # Keep references: Tk does not hold on to PhotoImages itself
+        self.ticker_images = [self.ImageTk.PhotoImage(background), self.ImageTk.PhotoImage(strip)]
+        self.ticker_canvas.create_image(0, 0, anchor='nw', image=self.ticker_images[0], tags='ticker_bg')
+        self.ticker_item_id = self.ticker_canvas.create_image(x, 0, anchor='nw', image=self.ticker_images[1])
+
+    def move_ticker(self, x):
+        self.ticker_canvas.coords(self.ticker_item_id, x, 0)
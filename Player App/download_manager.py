@@ -0,0 +1,129 @@
+# download_manager.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+PART_SUFFIX = ".part"
+
+
+class DownloadManager:
+    """Parallel, resumable media downloader.
+
+    Files are streamed into "<dest>.part" and renamed into place only once they
+    are complete, so a file at the final path is never a partial download. An
+    existing .part file is resumed with an HTTP Range request.
+    """
+
+    def __init__(self, max_workers=4, per_host_limit=2, timeout=60, session=None):
+        self.max_workers = max(1, int(max_workers))
+        self.per_host_limit = max(1, int(per_host_limit))
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="download")
+        self.host_slots = {}
+        self.path_locks = {}
+        self.host_slots_lock = threading.Lock()
+        # Bytes received per host, for metrics
+        self.bytes_by_host = {}
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self.host_slots_lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self.host_slots[host]
+
+    @staticmethod
+    def chunk_size_for(total_bytes):
+        """Bigger files get bigger chunks: ~64 reads per file, clamped to 64 KB..4 MB"""
+        if not total_bytes:
+            return MIN_CHUNK_SIZE * 4
+        return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, total_bytes // 64))
+
+    def _path_lock(self, dest_path):
+        with self.host_slots_lock:
+            if dest_path not in self.path_locks:
+                self.path_locks[dest_path] = threading.Lock()
+            return self.path_locks[dest_path]
+
+    def download(self, url, dest_path, name=None, session=None, timeout=None):
+        """Download url to dest_path, resuming a previous .part file if present.
+
+        session and timeout override the manager's own for this download
+        (e.g. LAN peers, which must not be retried like the CMS).
+        Returns dest_path on success, None on failure.
+        """
+        label = name or os.path.basename(dest_path)
+        try:
+            # The same asset can appear several times in a playlist
+            with self._path_lock(dest_path):
+                if os.path.exists(dest_path):
+                    return dest_path
+                with self._host_slot(url):
+                    if not self._fetch(url, dest_path, label, session, timeout):
+                        # The stale .part file was discarded: retry from scratch once
+                        self._fetch(url, dest_path, label, session, timeout)
+            print(f"✅ Downloaded: {os.path.basename(dest_path)}")
+            return dest_path
+        except Exception as e:
+            print(f"❌ Failed to download {label}: {e}")
+            return None
+
+    def _fetch(self, url, dest_path, label, session=None, timeout=None):
+        """Stream url into the .part file and rename it into place.
+
+        Returns False if the .part file had to be discarded before anything was written.
+        """
+        part_path = dest_path + PART_SUFFIX
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f"bytes={offset}-"} if offset else {}
+
+        session = session or self.session
+        with session.get(url, stream=True, timeout=timeout or self.timeout, headers=headers) as r:
+            if r.status_code == 416 and offset:
+                # Range not satisfiable: the .part file may already hold everything
+                total = r.headers.get('Content-Range', '').rpartition('/')[2]
+                if total.isdigit() and int(total) == offset:
+                    os.replace(part_path, dest_path)
+                    return True
+                os.remove(part_path)
+                return False
+            r.raise_for_status()
+
+            if r.status_code == 206:
+                mode = 'ab'
+                print(f"⏯️ Resuming {label} at {offset} bytes...")
+            else:
+                # Server ignored the Range header: start over
+                mode = 'wb'
+                print(f"📥 Downloading {label}...")
+
+            remaining = int(r.headers.get('Content-Length') or 0)
+            written = 0
+            try:
+                with open(part_path, mode) as f:
+                    for chunk in r.iter_content(chunk_size=self.chunk_size_for(remaining)):
+                        f.write(chunk)
+                        written += len(chunk)
+            finally:
+                host = urlparse(url).netloc
+                with self.host_slots_lock:
+                    self.bytes_by_host[host] = self.bytes_by_host.get(host, 0) + written
+
+            if remaining and written != remaining:
+                raise IOError(f"incomplete download ({written}/{remaining} bytes)")
+
+        os.replace(part_path, dest_path)
+        return True
+
+    def map(self, fn, items):
+        """Run fn over items on the download pool; results keep item order"""
+        return list(self.executor.map(fn, items))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,411 @@
+# frame_renderer.py
+import collections
+import hashlib
+import mmap
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+LOGO_MARGIN = 20
+# Frames are stored as raw RGBX pixels so they can be memory-mapped straight
+# into an image: no decode, no copy until the display backend takes the pixels
+FRAME_FORMAT = ".rgbx"
+FRAME_MODE = "RGBX"
+FRAME_BYTES_PER_PIXEL = 4
+
+FONT_PATHS = [
+    "arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"
+]
+BOLD_FONT_PATHS = [
+    "arialbd.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf"
+]
+
+
+@lru_cache(maxsize=16)
+def load_font(size, bold=False):
+    """Probe the font candidates once per (size, weight)"""
+    for font_path in (BOLD_FONT_PATHS if bold else FONT_PATHS):
+        try:
+            return ImageFont.truetype(font_path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def wrap_text(text, font, max_width):
+    """Greedy word wrap measuring each word once (linear in text length).
+
+    Returns a list of (line, width) tuples.
+    """
+    space_width = font.getlength(" ")
+    lines = []
+    current_words, current_width = [], 0.0
+    for word in text.split():
+        word_width = font.getlength(word)
+        candidate_width = current_width + space_width + word_width if current_words else word_width
+        if current_words and candidate_width >= max_width:
+            lines.append((" ".join(current_words), current_width))
+            current_words, current_width = [word], word_width
+        else:
+            current_words.append(word)
+            current_width = candidate_width
+    if current_words:
+        lines.append((" ".join(current_words), current_width))
+    return lines
+
+
+def render_text_slide(text, content_size, logo=None):
+    """Render centred, word-wrapped white text on black, with the logo burned in"""
+    content_width, content_height = content_size
+    final_image = Image.new('RGB', (content_width, content_height), 'black')
+    draw = ImageDraw.Draw(final_image)
+
+    font_size = max(24, content_height // 25)
+    font = load_font(font_size)
+    lines = wrap_text(text, font, content_width * 0.9)
+
+    line_height = font_size + 10
+    y = (content_height - len(lines) * line_height) / 2
+    for line, line_width in lines:
+        draw.text(((content_width - line_width) / 2, y), line, font=font, fill="white")
+        y += line_height
+
+    if logo:
+        composite_logo(final_image, logo)
+    return final_image
+
+
+def render_ticker_strip(text, font_size, height, fill='white'):
+    """Render ticker text once into a transparent RGBA strip, measured with real font metrics"""
+    font = load_font(font_size, bold=True)
+    left, top, right, bottom = font.getbbox(text)
+    strip = Image.new('RGBA', (max(1, right - left), height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(strip)
+    draw.text((-left, (height - (bottom - top)) // 2 - top), text, font=font, fill=fill)
+    return strip
+
+
+@lru_cache(maxsize=4)
+def _load_logo(logo_path, logo_mtime, logo_height):
+    with Image.open(logo_path) as img:
+        img = img.convert('RGBA')
+        logo_width = int(logo_height * img.width / img.height)
+        return img.resize((logo_width, logo_height), Image.Resampling.LANCZOS)
+
+
+def composite_logo(frame, logo):
+    frame.paste(logo, (frame.width - logo.width - LOGO_MARGIN, LOGO_MARGIN), mask=logo)
+
+
+def fit_size(image_size, content_size):
+    """Largest size with the image's aspect ratio that fits content_size"""
+    content_width, content_height = content_size
+    img_ratio = image_size[0] / image_size[1]
+    if img_ratio > content_width / content_height:
+        return content_width, max(1, int(content_width / img_ratio))
+    return max(1, int(content_height * img_ratio)), content_height
+
+
+def decode_fitted(image_path, content_size):
+    """Decode an image already scaled to fit content_size.
+
+    JPEGs are decoded in draft mode: libjpeg scales by 1/2, 1/4 or 1/8 while
+    decoding, so a 4K photo for a 1080p screen never exists at full size.
+    Only the remaining fractional scale is resampled.
+    """
+    with Image.open(image_path) as img:
+        size = fit_size(img.size, content_size)
+        img.draft('RGB', size)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if img.size == size:
+            img.load()
+            return img
+        return img.resize(size, Image.Resampling.LANCZOS)
+
+
+class FrameBuffer:
+    """A reusable screen-sized RGB canvas.
+
+    Each frame is pasted over the previous one and only the letterbox bars
+    around it are cleared, so composing a slide allocates nothing beyond the
+    decoded picture itself.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.image = Image.new('RGB', size, 'black')
+
+    def compose(self, picture, logo=None):
+        width, height = self.size
+        left, top = (width - picture.width) // 2, (height - picture.height) // 2
+        right, bottom = left + picture.width, top + picture.height
+        for box in ((0, 0, width, top), (0, bottom, width, height), (0, top, left, bottom), (right, top, width, bottom)):
+            if box[2] > box[0] and box[3] > box[1]:
+                self.image.paste((0, 0, 0), box)
+        self.image.paste(picture, (left, top))
+        if logo:
+            composite_logo(self.image, logo)
+        return self.image
+
+
+# One buffer per (buffer class, content size) in each render worker, reused
+# across frames; both compositing engines keep theirs here
+_frame_buffers = {}
+# array_compositor module, or False once numpy/OpenCV turned out to be missing
+_array_engine = None
+
+
+def frame_buffer(size, buffer_class=FrameBuffer):
+    buffer = _frame_buffers.get((buffer_class, size))
+    if buffer is None:
+        # A new content size makes every older buffer useless
+        for key in [key for key in _frame_buffers if key[1] != size]:
+            del _frame_buffers[key]
+        buffer = _frame_buffers[(buffer_class, size)] = buffer_class(size)
+    return buffer
+
+
+def array_engine():
+    """The NumPy/OpenCV compositor, imported on first use; None if unavailable"""
+    global _array_engine
+    if _array_engine is None:
+        try:
+            import array_compositor
+            _array_engine = array_compositor
+        except ImportError:
+            _array_engine = False
+    return _array_engine or None
+
+
+def render_image_frame(image_path, content_size, logo_path, logo_mtime, logo_height, frame_path, engine='auto'):
+    """Letterbox an image to content_size, burn in the logo and save it to frame_path.
+
+    engine 'auto' composes with NumPy/OpenCV when they are installed and can
+    decode the file, and with Pillow otherwise; 'pillow' forces Pillow.
+    Runs in a worker process, so it must stay a picklable top-level function.
+    """
+    content_size = tuple(content_size)
+    pixels = None
+    if engine != 'pillow' and array_engine():
+        pixels = array_engine().compose_frame(image_path, content_size, logo_path, logo_mtime, logo_height)
+    if pixels is None:
+        logo = _load_logo(logo_path, logo_mtime, logo_height) if logo_path else None
+        pixels = frame_buffer(content_size).compose(decode_fitted(image_path, content_size), logo).tobytes('raw', FRAME_MODE)
+
+    tmp_path = f"{frame_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(pixels)
+    os.replace(tmp_path, frame_path)
+    return frame_path
+
+
+def frame_size(content_size):
+    """Bytes of one rendered frame file"""
+    return content_size[0] * content_size[1] * FRAME_BYTES_PER_PIXEL
+
+
+def map_frame(frame_path, content_size):
+    """Wrap a rendered frame file as a read-only image, without decoding or copying it"""
+    with open(frame_path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) != frame_size(content_size):
+        mapped.close()
+        raise ValueError(f"frame {os.path.basename(frame_path)} does not match {content_size[0]}x{content_size[1]}")
+    return Image.frombuffer(FRAME_MODE, tuple(content_size), mapped, 'raw', FRAME_MODE, 0, 1)
+
+
+class FrameRenderer:
+    """Renders screen-sized image frames in a process pool, cached on disk.
+
+    Frames are keyed by (source hash, content size, logo mtime). Media cache
+    objects are named after their content hash, so the source file name is
+    the source hash; a changed logo or screen size simply produces new keys.
+    With max_bytes set, every stored frame counts against that budget and
+    the least recently used frames are pruned as soon as it is exceeded.
+    """
+
+    def __init__(self, frames_dir, logo_path, logo_height, max_workers=None, engine='auto', max_bytes=None):
+        self.frames_dir = frames_dir
+        self.logo_path = logo_path
+        self.logo_height = logo_height
+        self.engine = engine
+        self.max_bytes = max_bytes
+        os.makedirs(frames_dir, exist_ok=True)
+        self._purge_other_formats()
+
+        # On-disk frame cache lookups and budget evictions, for metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Renders still in the pool, by frame path: a second request for the
+        # same frame gets the same future instead of a duplicate job
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.stored_bytes = self.prune()
+
+        max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        # spawn: never fork a process that holds the Tk/X11 connection
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _purge_other_formats(self):
+        """Remove frames left by an older frame format (e.g. PNG)"""
+        for name in os.listdir(self.frames_dir):
+            if not name.endswith(FRAME_FORMAT):
+                try:
+                    os.remove(os.path.join(self.frames_dir, name))
+                except OSError:
+                    pass
+
+    def _logo_mtime(self):
+        if self.logo_path and os.path.exists(self.logo_path):
+            return os.path.getmtime(self.logo_path)
+        return None
+
+    def frame_path(self, image_path, content_size, logo_mtime):
+        source_hash = os.path.splitext(os.path.basename(image_path))[0]
+        key = f"{source_hash}|{content_size[0]}x{content_size[1]}|{logo_mtime}"
+        return os.path.join(self.frames_dir, hashlib.sha1(key.encode()).hexdigest() + FRAME_FORMAT)
+
+    def submit(self, image_path, content_size):
+        """Return a Future resolving to the rendered frame path"""
+        logo_mtime = self._logo_mtime()
+        frame_path = self.frame_path(image_path, content_size, logo_mtime)
+        with self.lock:
+            future = self.in_flight.get(frame_path)
+            if future:
+                return future
+
+            if os.path.exists(frame_path):
+                # Touch for LRU pruning
+                os.utime(frame_path)
+                self.hits += 1
+                future = Future()
+                future.set_result(frame_path)
+                return future
+
+            self.misses += 1
+            logo_path = self.logo_path if logo_mtime is not None else None
+            future = self.executor.submit(render_image_frame, image_path, content_size, logo_path, logo_mtime, self.logo_height, frame_path, self.engine)
+            self.in_flight[frame_path] = future
+        future.add_done_callback(lambda done: self._finished(frame_path, content_size, done))
+        return future
+
+    def _finished(self, frame_path, content_size, future):
+        with self.lock:
+            self.in_flight.pop(frame_path, None)
+            if future.cancelled() or future.exception():
+                return
+            self.stored_bytes += frame_size(content_size)
+            over_budget = self.max_bytes and self.stored_bytes > self.max_bytes
+        if over_budget:
+            self.prune()
+
+    def capacity(self, content_size):
+        """How many frames of content_size the budget holds (None: unbounded)"""
+        if not self.max_bytes:
+            return None
+        return max(1, self.max_bytes // frame_size(content_size))
+
+    def render(self, image_path, content_size):
+        return self.submit(image_path, content_size).result()
+
+    def prune(self, max_bytes=None):
+        """Drop least recently used frames until the frame cache fits max_bytes
+        (the renderer's budget by default); returns the bytes left on disk"""
+        max_bytes = max_bytes or self.max_bytes
+        # Called from render callbacks and the sync thread: one prune at a time,
+        # and never alongside submit() checking or touching a frame
+        with self.lock:
+            frames = []
+            for name in os.listdir(self.frames_dir):
+                if not name.endswith(FRAME_FORMAT):
+                    continue
+                path = os.path.join(self.frames_dir, name)
+                try:
+                    stat = os.stat(path)
+                    frames.append((stat.st_mtime, stat.st_size, path))
+                except OSError:
+                    pass
+
+            total = sum(size for _, size, _ in frames)
+            for _, size, path in sorted(frames):
+                if not max_bytes or total <= max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    self.evictions += 1
+                except OSError:
+                    pass
+            self.stored_bytes = total
+            return total
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class FrameCache:
+    """Byte-budgeted LRU cache for decoded display frames.
+
+    Entries are stored with their size in bytes; inserting past max_bytes
+    evicts the least recently used frames. Hit/miss/eviction counters are
+    kept for monitoring.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self.entries = collections.OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, frame, nbytes):
+        self.discard(key)
+        self.entries[key] = (frame, nbytes)
+        self.total_bytes += nbytes
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            self._evict(next(iter(self.entries)))
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.total_bytes -= entry[1]
+
+    def _evict(self, key):
+        self.discard(key)
+        self.evictions += 1
+
+    def retain(self, keys):
+        """Evict every frame not in keys (e.g. everything behind the playhead)"""
+        keep = set(keys)
+        for key in [k for k in self.entries if k not in keep]:
+            self._evict(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
@@ -0,0 +1,229 @@
+# media_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+
+INDEX_FILE = "cache_index.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+STALE_PART_SECONDS = 24 * 3600
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaCache:
+    """Content-addressed media store with a persistent index and LRU eviction.
+
+    Objects live in <cache_dir>/objects/<sha256><ext>. The index maps each
+    source key (media id + url + revision) to a content hash, so identical files
+    under different ids are stored once and a re-uploaded asset gets a new key.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.incoming_dir = os.path.join(cache_dir, "incoming")
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self.lock = threading.RLock()
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.incoming_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    @staticmethod
+    def source_key(media_item):
+        """Identify one revision of a CMS asset"""
+        revision = media_item.get('checksum') or f"{media_item.get('uploadedAt', '')}:{media_item.get('fileSize', '')}"
+        return f"{media_item.get('id')}|{media_item.get('url')}|{revision}"
+
+    def _load_index(self):
+        index = {'objects': {}, 'sources': {}, 'legacy': {}}
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r') as f:
+                    index.update(json.load(f))
+        except Exception as e:
+            print(f"Failed to load cache index: {e}")
+
+        # Drop entries whose object file disappeared
+        index['objects'] = {h: o for h, o in index['objects'].items()
+                            if os.path.exists(self._object_path(h, o['ext']))}
+        # Adopt objects the index does not know (lost or corrupt index, or a
+        # crash between storing an object and saving the index). Object names
+        # are their content hash, so a checksummed item can claim them again.
+        for name in os.listdir(self.objects_dir):
+            content_hash, ext = os.path.splitext(name)
+            path = os.path.join(self.objects_dir, name)
+            if content_hash not in index['objects'] and os.path.isfile(path):
+                index['objects'][content_hash] = {'ext': ext, 'size': os.path.getsize(path),
+                                                  'last_used': os.path.getmtime(path)}
+        index['sources'] = {k: h for k, h in index['sources'].items() if h in index['objects']}
+        index['legacy'] = {k: h for k, h in index['legacy'].items() if h in index['objects']}
+        return index
+
+    @staticmethod
+    def legacy_name(media_item):
+        """File name the old "<id>_<name>" cache layout used for this asset"""
+        return f"{media_item.get('id')}_{os.path.basename(media_item.get('url', ''))}"
+
+    def migrate_legacy_files(self):
+        """Move files left by the old "<id>_<name>" cache layout into the store.
+
+        Each file is stored under its sha256 and remembered by its old name,
+        so lookup() hands it to the matching asset instead of the whole fleet
+        re-downloading its library on upgrade. Hashing can take a while on a
+        large cache: call this off the UI thread.
+        """
+        migrated = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not os.path.isfile(path) or name == INDEX_FILE or name.endswith('.tmp'):
+                continue
+            try:
+                content_hash = file_sha256(path)
+                ext = os.path.splitext(name)[1]
+                with self.lock:
+                    obj = self.index['objects'].get(content_hash)
+                    if obj:
+                        os.remove(path)
+                    else:
+                        obj = {'ext': ext, 'size': os.path.getsize(path), 'last_used': time.time()}
+                        os.replace(path, self._object_path(content_hash, ext))
+                        self.index['objects'][content_hash] = obj
+                    self.index['legacy'][name] = content_hash
+                migrated += 1
+            except OSError as e:
+                print(f"Failed to migrate cached file {name}: {e}")
+
+        if migrated:
+            self.save_index()
+            print(f"📦 Migrated {migrated} file(s) from the old cache layout")
+        return migrated
+
+    def save_index(self):
+        with self.lock:
+            try:
+                tmp_path = self.index_path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(self.index, f, separators=(',', ':'))
+                os.replace(tmp_path, self.index_path)
+            except Exception as e:
+                print(f"Failed to save cache index: {e}")
+
+    def _object_path(self, content_hash, ext):
+        return os.path.join(self.objects_dir, content_hash + ext)
+
+    def incoming_path(self, media_item):
+        """Stable staging path, so an interrupted download can be resumed"""
+        key_hash = hashlib.sha1(self.source_key(media_item).encode()).hexdigest()
+        return os.path.join(self.incoming_dir, key_hash + os.path.splitext(media_item.get('url', ''))[1])
+
+    def total_bytes(self):
+        with self.lock:
+            return sum(o['size'] for o in self.index['objects'].values())
+
+    def lookup(self, media_item):
+        """Return the cached path for this asset revision, or None"""
+        with self.lock:
+            key = self.source_key(media_item)
+            content_hash = self.index['sources'].get(key) or self._claim(media_item)
+            if not content_hash:
+                return None
+            self.index['sources'][key] = content_hash
+            obj = self.index['objects'][content_hash]
+            obj['last_used'] = time.time()
+            return self._object_path(content_hash, obj['ext'])
+
+    def _claim(self, media_item):
+        """Content hash of a stored object this asset can adopt without a download:
+        the object named by its checksum, or its file from the old cache layout."""
+        expected = (media_item.get('checksum') or '').lower()
+        if expected in self.index['objects']:
+            content_hash = expected
+        else:
+            content_hash = self.index['legacy'].get(self.legacy_name(media_item))
+            if not content_hash or (expected and expected != content_hash):
+                return None
+        self.index['legacy'].pop(self.legacy_name(media_item), None)
+        self.save_index()
+        return content_hash
+
+    def path_for_hash(self, content_hash):
+        """Object path for a content hash, or None if it is not stored (used to serve peers)"""
+        with self.lock:
+            obj = self.index['objects'].get(content_hash)
+            return self._object_path(content_hash, obj['ext']) if obj else None
+
+    def insert(self, media_item, staged_path):
+        """Move a downloaded file into the store after verifying its checksum.
+
+        Returns the object path, or None if the checksum does not match.
+        """
+        content_hash = file_sha256(staged_path)
+        expected = media_item.get('checksum')
+        if expected and expected.lower() != content_hash:
+            print(f"❌ Checksum mismatch for {media_item.get('name', 'Unknown')}: expected {expected}, got {content_hash}")
+            os.remove(staged_path)
+            return None
+
+        ext = os.path.splitext(staged_path)[1]
+        with self.lock:
+            obj = self.index['objects'].get(content_hash)
+            if obj:
+                # Identical content is already stored: deduplicate
+                os.remove(staged_path)
+            else:
+                obj = {'ext': ext, 'size': os.path.getsize(staged_path)}
+                os.replace(staged_path, self._object_path(content_hash, ext))
+                self.index['objects'][content_hash] = obj
+            obj['last_used'] = time.time()
+            self.index['sources'][self.source_key(media_item)] = content_hash
+            self.save_index()
+            return self._object_path(content_hash, obj['ext'])
+
+    def evict(self, active_paths=()):
+        """Evict least recently used objects until the store fits max_bytes.
+
+        Objects referenced by active_paths (the playing and incoming playlists)
+        are never evicted.
+        """
+        active = {os.path.basename(p).split('.')[0] for p in active_paths if p}
+        evicted = 0
+        with self.lock:
+            total = self.total_bytes()
+            candidates = sorted((o['last_used'], h) for h, o in self.index['objects'].items() if h not in active)
+            for _, content_hash in candidates:
+                if total <= self.max_bytes:
+                    break
+                obj = self.index['objects'].pop(content_hash)
+                try:
+                    os.remove(self._object_path(content_hash, obj['ext']))
+                except OSError:
+                    pass
+                total -= obj['size']
+                evicted += 1
+
+            if evicted:
+                self.index['sources'] = {k: h for k, h in self.index['sources'].items() if h in self.index['objects']}
+                self.index['legacy'] = {k: h for k, h in self.index['legacy'].items() if h in self.index['objects']}
+                print(f"🧹 Evicted {evicted} cached file(s); cache now {total / (1024 * 1024):.1f} MB")
+            self.save_index()
+
+        # Abandoned partial downloads
+        now = time.time()
+        for name in os.listdir(self.incoming_dir):
+            path = os.path.join(self.incoming_dir, name)
+            try:
+                if now - os.path.getmtime(path) > STALE_PART_SECONDS:
+                    os.remove(path)
+            except OSError:
+                pass
+        return evicted
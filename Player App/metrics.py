@@ -0,0 +1,194 @@
+# metrics.py
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; covers a 1 ms frame blit up to a multi-minute download
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms, plus collectors that
+    read existing stats (cache hit counters, byte totals) at scrape time.
+
+    Rendered in Prometheus text format by render(); summary() is a compact
+    digest for the heartbeat.
+    """
+
+    def __init__(self, prefix="player"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+        self.collectors = []
+
+    def _name(self, name):
+        return f"{self.prefix}_{name}"
+
+    def describe(self, name, text):
+        self.help[self._name(name)] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (self._name(name), _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (self._name(name), _label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def add_collector(self, name, kind, text, collect):
+        """collect() -> [(labels dict, value)], called on every scrape"""
+        self.describe(name, text)
+        self.collectors.append((self._name(name), kind, collect))
+
+    def render(self):
+        lines = []
+        by_name = {}
+        with self.lock:
+            for (name, key), value in self.counters.items():
+                by_name.setdefault((name, 'counter'), []).append((key, value))
+            histograms = [(name, key, h.buckets, list(h.counts), h.sum, h.count) for (name, key), h in self.histograms.items()]
+
+        for name, kind, collect in self.collectors:
+            try:
+                samples = collect()
+            except Exception:
+                continue
+            by_name.setdefault((name, kind), []).extend((_label_key(labels), value) for labels, value in samples)
+
+        for (name, kind), samples in sorted(by_name.items()):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in samples:
+                lines.append(f"{name}{_format_labels(key)} {value}")
+
+        seen = set()
+        for name, key, buckets, counts, total, count in sorted(histograms, key=lambda h: (h[0], h[1])):
+            if name not in seen:
+                seen.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Per-histogram count/p50/p95/max in milliseconds, plus counters and collected values, for the heartbeat"""
+        digest = {}
+        with self.lock:
+            for (name, key), h in self.histograms.items():
+                label = name[len(self.prefix) + 1:] + "".join(f".{v}" for _, v in key)
+                digest[label] = {
+                    'count': h.count,
+                    'p50Ms': round(h.quantile(0.5) * 1000, 1),
+                    'p95Ms': round(h.quantile(0.95) * 1000, 1),
+                    'maxMs': round(h.max * 1000, 1)
+                }
+            for (name, key), value in self.counters.items():
+                digest[name[len(self.prefix) + 1:] + "".join(f".{v}" for _, v in key)] = value
+        for name, _, collect in self.collectors:
+            try:
+                for labels, value in collect():
+                    digest[name[len(self.prefix) + 1:] + "".join(f".{v}" for _, v in _label_key(labels))] = value
+            except Exception:
+                continue
+        return digest
+
+
+class MetricsServer:
+    """Serves GET /metrics in Prometheus text format"""
+
+    def __init__(self, metrics, host='127.0.0.1', port=9108):
+        registry = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer((host, int(port)), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        host, port = self.httpd.server_address[:2]
+        print(f"📊 Metrics at http://{host}:{port}/metrics")
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
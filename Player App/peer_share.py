@@ -0,0 +1,86 @@
+# peer_share.py
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OBJECT_PATH = re.compile(r'^/objects/([0-9a-f]{64})$')
+
+
+class PeerMediaServer:
+    """Serves this player's cached media objects to other players on the LAN.
+
+    Objects are addressed by content hash (GET /objects/<sha256>), with Range
+    support so an interrupted peer download resumes like a CMS one. Concurrent
+    uploads are capped; a busy player answers 503 and the downloader moves on
+    to the next peer or the CMS. Receivers verify the hash, so a peer can
+    never inject content.
+    """
+
+    def __init__(self, media_cache, port=0, max_uploads=2):
+        self.media_cache = media_cache
+        self.upload_slots = threading.BoundedSemaphore(max(1, int(max_uploads)))
+        self.httpd = ThreadingHTTPServer(('', int(port)), self._handler())
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                match = OBJECT_PATH.match(self.path)
+                path = server.media_cache.path_for_hash(match.group(1)) if match else None
+                if not path or not os.path.exists(path):
+                    self.send_error(404)
+                    return
+                if not server.upload_slots.acquire(blocking=False):
+                    self.send_error(503)
+                    return
+                try:
+                    server.send_object(self, path)
+                finally:
+                    server.upload_slots.release()
+
+        return Handler
+
+    def send_object(self, handler, path):
+        size = os.path.getsize(path)
+        offset = 0
+        range_match = re.match(r'^bytes=(\d+)-$', handler.headers.get('Range', ''))
+        if range_match:
+            offset = int(range_match.group(1))
+            if offset >= size:
+                handler.send_response(416)
+                handler.send_header('Content-Range', f"bytes */{size}")
+                handler.send_header('Content-Length', '0')
+                handler.end_headers()
+                return
+            handler.send_response(206)
+            handler.send_header('Content-Range', f"bytes {offset}-{size - 1}/{size}")
+        else:
+            handler.send_response(200)
+        handler.send_header('Content-Type', 'application/octet-stream')
+        handler.send_header('Content-Length', str(size - offset))
+        handler.end_headers()
+        handler.wfile.flush()
+
+        with open(path, 'rb') as f:
+            try:
+                handler.connection.sendfile(f, offset, size - offset)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        print(f"🤝 Sharing cached media with peers on port {self.port}")
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -3,68 +3,365 @@ import socket
 import json
 import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+DISCOVERY_PORT = 8888
+MAX_DATAGRAM_BYTES = 8192
+# A discovery query is a few dozen bytes; anything bigger is not one
+MAX_QUERY_BYTES = 512
+MAX_TRACKED_SOURCES = 4096
+
+
+def discovery_socket(port=DISCOVERY_PORT):
+    """UDP socket bound to the discovery port, shareable by several processes on one host.
+
+    Broadcast datagrams are delivered to every socket bound with SO_REUSEADDR,
+    so a CMS responder and any number of players can listen side by side.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, 'SO_REUSEPORT'):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(('', port))
+    return sock
+
 
 class PlayerDiscovery:
-    def __init__(self, cms_url):
+    def __init__(self, cms_url, kind='cms', broadcast_address='<broadcast>'):
         self.cms_url = cms_url
-        self.discovery_port = 8888
+        # 'cms' or 'edge' (a caching proxy in front of the CMS)
+        self.kind = kind
+        self.broadcast_address = broadcast_address
+        self.discovery_port = DISCOVERY_PORT
         self.running = False
         
-    def start_discovery_server(self):
-        """Start UDP discovery server"""
+    def start_discovery_server(self, stats_interval=60, per_source_limit=20):
+        """Start UDP discovery server.
+
+        Work per packet is bounded: oversized datagrams and other traffic on
+        the port (peer queries) are dropped without parsing, the reply is
+        encoded once, and each source address gets at most per_source_limit
+        replies per second. Counters are logged every stats_interval seconds
+        instead of once per packet.
+        """
         self.running = True
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.bind(('', self.discovery_port))
+        sock = discovery_socket(self.discovery_port)
+        sock.settimeout(1.0)
+        
+        response = json.dumps({
+            'type': 'cms_response',
+            'cms_url': self.cms_url,
+            'kind': self.kind,
+            'registration_endpoint': f'{self.cms_url}/players/register'
+        }).encode()
         
         print(f"Discovery server listening on port {self.discovery_port}")
         
+        replied = limited = ignored = 0
+        sources = {}
+        window_start = last_stats = time.monotonic()
         while self.running:
             try:
-                data, addr = sock.recvfrom(1024)
-                message = json.loads(data.decode())
-                
-                if message.get('type') == 'player_discovery':
-                    # Respond with CMS connection info
-                    response = {
-                        'type': 'cms_response',
-                        'cms_url': self.cms_url,
-                        'registration_endpoint': f'{self.cms_url}/players/register'
-                    }
-                    
-                    sock.sendto(json.dumps(response).encode(), addr)
-                    print(f"Responded to player discovery from {addr}")
-                    
-            except Exception as e:
-                print(f"Discovery error: {e}")
+                data, addr = sock.recvfrom(MAX_DATAGRAM_BYTES)
+            except socket.timeout:
+                data = None
+            except OSError:
+                break
+            
+            now = time.monotonic()
+            if data is not None:
+                if len(data) > MAX_QUERY_BYTES or b'"player_discovery"' not in data:
+                    ignored += 1
+                else:
+                    if now - window_start >= 1.0:
+                        sources.clear()
+                        window_start = now
+                    count = sources.get(addr[0], 0)
+                    if count >= per_source_limit or (count == 0 and len(sources) >= MAX_TRACKED_SOURCES):
+                        limited += 1
+                    else:
+                        sources[addr[0]] = count + 1
+                        try:
+                            sock.sendto(response, addr)
+                            replied += 1
+                        except OSError:
+                            limited += 1
+            
+            if now - last_stats >= stats_interval:
+                if replied or limited:
+                    print(f"Discovery: {replied} replies, {limited} rate-limited, {ignored} ignored in the last {int(now - last_stats)}s")
+                replied = limited = ignored = 0
+                last_stats = now
         
         sock.close()
     
-    def broadcast_discovery(self):
-        """Broadcast discovery message (for player side)"""
+    def stop(self):
+        self.running = False
+    
+    def discover_all(self, window=1.5, attempts=2):
+        """Broadcast discovery and collect every CMS/edge responder within window seconds.
+
+        The query is re-sent attempts times across the window to survive a
+        lost datagram. Returns responses in arrival order, one per cms_url.
+        """
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
         
-        message = {
+        message = json.dumps({
             'type': 'player_discovery',
             'hostname': socket.gethostname()
-        }
+        }).encode()
         
+        responses = {}
         try:
-            sock.sendto(json.dumps(message).encode(), ('<broadcast>', self.discovery_port))
-            
-            # Wait for response
-            sock.settimeout(5)
-            data, addr = sock.recvfrom(1024)
-            response = json.loads(data.decode())
-            
-            if response.get('type') == 'cms_response':
-                return response
-                
-        except socket.timeout:
-            print("No CMS found on network")
+            start = time.monotonic()
+            sends = [start + window * n / attempts for n in range(attempts)]
+            while True:
+                now = time.monotonic()
+                while sends and sends[0] <= now:
+                    sends.pop(0)
+                    sock.sendto(message, (self.broadcast_address, self.discovery_port))
+                remaining = start + window - now
+                if remaining <= 0:
+                    break
+                sock.settimeout(min(remaining, sends[0] - now) if sends else remaining)
+                try:
+                    data, addr = sock.recvfrom(MAX_DATAGRAM_BYTES)
+                except socket.timeout:
+                    continue
+                try:
+                    response = json.loads(data.decode())
+                except ValueError:
+                    continue
+                if response.get('type') == 'cms_response' and response.get('cms_url'):
+                    response.setdefault('kind', 'cms')
+                    response['address'] = addr[0]
+                    responses.setdefault(response['cms_url'], response)
         except Exception as e:
             print(f"Discovery broadcast error: {e}")
         finally:
             sock.close()
-            
-        return None
\ No newline at end of file
+        
+        if not responses:
+            print("No CMS found on network")
+        return list(responses.values())
+    
+    def broadcast_discovery(self):
+        """Broadcast discovery message (for player side); returns the first responder"""
+        responses = self.discover_all()
+        return responses[0] if responses else None
+
+
+class PeerDiscovery:
+    """Finds LAN players that hold a media object, over the discovery port.
+
+    Every player answers peer_query broadcasts for content hashes it has
+    cached with the port of its peer media server. locate() broadcasts a
+    query from a fresh socket and collects the answers for a short window,
+    so several players on one host each get their own replies.
+    """
+
+    def __init__(self, has_object, http_port, broadcast_address='<broadcast>', port=DISCOVERY_PORT, timeout=0.3):
+        # has_object(content_hash) -> bool
+        self.has_object = has_object
+        self.http_port = http_port
+        self.broadcast_address = broadcast_address
+        self.port = port
+        self.timeout = timeout
+        self.node_id = uuid.uuid4().hex
+        self.running = False
+        self.sock = None
+
+    def start(self):
+        self.running = True
+        self.sock = discovery_socket(self.port)
+        thread = threading.Thread(target=self._serve)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+    def _serve(self):
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+                message = json.loads(data.decode())
+                if message.get('type') != 'peer_query' or message.get('node') == self.node_id:
+                    continue
+                content_hash = message.get('hash')
+                if content_hash and self.has_object(content_hash):
+                    reply = {'type': 'peer_have', 'hash': content_hash, 'port': self.http_port, 'node': self.node_id}
+                    self.sock.sendto(json.dumps(reply).encode(), addr)
+            except OSError:
+                if not self.running:
+                    break
+            except Exception:
+                # Malformed datagram: ignore
+                continue
+
+    def locate(self, content_hash):
+        """Return media server URLs of peers holding content_hash, fastest responder first"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        query = {'type': 'peer_query', 'hash': content_hash, 'node': self.node_id}
+        peers = []
+        try:
+            sock.sendto(json.dumps(query).encode(), (self.broadcast_address, self.port))
+            deadline = time.monotonic() + self.timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                sock.settimeout(remaining)
+                try:
+                    data, addr = sock.recvfrom(2048)
+                except socket.timeout:
+                    break
+                try:
+                    reply = json.loads(data.decode())
+                except ValueError:
+                    continue
+                if reply.get('type') == 'peer_have' and reply.get('hash') == content_hash:
+                    url = f"http://{addr[0]}:{reply['port']}/objects/{content_hash}"
+                    if url not in peers:
+                        peers.append(url)
+        except OSError as e:
+            print(f"Peer query error: {e}")
+        finally:
+            sock.close()
+        return peers
+
+
+class CmsSelector:
+    """Picks the CMS (or edge cache) this player talks to, by measured latency.
+
+    Candidates are the configured default, the cached previous choice and
+    every discovery responder; each is probed over HTTP and the fastest
+    healthy one wins. The choice is cached in cache_path. report() feeds in
+    the outcome of regular CMS requests; consecutive failures or a high
+    average latency trigger a background re-selection.
+    """
+
+    def __init__(self, default_url, cache_path, session, discovery=None, on_change=None,
+                 probes=3, probe_timeout=2.0, max_failures=3, max_latency=2.0, min_reselect_interval=60):
+        self.default_url = self.normalize(default_url)
+        self.cache_path = cache_path
+        self.session = session
+        self.discovery = discovery
+        self.on_change = on_change
+        self.probes = probes
+        self.probe_timeout = probe_timeout
+        self.max_failures = max_failures
+        self.max_latency = max_latency
+        self.min_reselect_interval = min_reselect_interval
+
+        self.url = self.default_url
+        self.failures = 0
+        self.avg_latency = None
+        self.last_selected = 0
+        self.selecting = threading.Lock()
+        self.cached = self._load()
+
+    @staticmethod
+    def normalize(url):
+        return url.rstrip('/') + '/'
+
+    def _load(self):
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, latency):
+        try:
+            with open(self.cache_path, 'w') as f:
+                json.dump({'url': self.url, 'latency': latency, 'selectedAt': time.time()}, f, indent=2)
+        except OSError as e:
+            print(f"Failed to save CMS choice: {e}")
+
+    def probe(self, url):
+        """Median round trip of a few health requests, or None if the server is unhealthy"""
+        samples = []
+        for _ in range(self.probes):
+            started = time.monotonic()
+            try:
+                # Servers without /health answer 404, which still proves they are up
+                response = self.session.get(f"{url}health", timeout=self.probe_timeout)
+                if response.status_code >= 500:
+                    return None
+            except Exception:
+                return None
+            samples.append(time.monotonic() - started)
+        samples.sort()
+        return samples[len(samples) // 2]
+
+    def use_cached(self):
+        """Adopt the cached choice if it still answers; True on success"""
+        if not (self.cached and self.cached.get('url')):
+            return False
+        url = self.normalize(self.cached['url'])
+        latency = self.probe(url)
+        if latency is None:
+            return False
+        self._switch(url, latency)
+        return True
+
+    def select(self):
+        """Discover, probe every candidate in parallel and switch to the fastest healthy one"""
+        with self.selecting:
+            self.last_selected = time.monotonic()
+            candidates = [self.url, self.default_url]
+            if self.cached and self.cached.get('url'):
+                candidates.append(self.normalize(self.cached['url']))
+            if self.discovery:
+                candidates.extend(self.normalize(r['cms_url']) for r in self.discovery.discover_all())
+            candidates = list(dict.fromkeys(candidates))
+
+            with ThreadPoolExecutor(max_workers=min(8, len(candidates))) as pool:
+                latencies = dict(zip(candidates, pool.map(self.probe, candidates)))
+            healthy = {url: latency for url, latency in latencies.items() if latency is not None}
+            if not healthy:
+                print(f"⚠️ No healthy CMS among {len(candidates)} candidate(s); staying on {self.url}")
+                return self.url
+
+            best = min(healthy, key=healthy.get)
+            print("📡 CMS candidates: " + ", ".join(
+                f"{url} {'down' if latency is None else f'{latency * 1000:.0f} ms'}" for url, latency in latencies.items()))
+            self._switch(best, healthy[best])
+            return self.url
+
+    def _switch(self, url, latency):
+        previous = self.url
+        self.url = url
+        self.failures = 0
+        self.avg_latency = latency
+        self._save(latency)
+        if url != previous:
+            print(f"📡 Using CMS {url} ({latency * 1000:.0f} ms)")
+            if self.on_change:
+                self.on_change(url)
+
+    def report(self, ok, latency=None):
+        """Record the outcome of a CMS request and re-select in the background when degraded"""
+        if ok:
+            self.failures = 0
+            if latency is not None:
+                self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+        else:
+            self.failures += 1
+
+        degraded = self.failures >= self.max_failures or (self.avg_latency or 0) > self.max_latency
+        if degraded and time.monotonic() - self.last_selected >= self.min_reselect_interval and not self.selecting.locked():
+            print(f"⚠️ CMS {self.url} degraded ({self.failures} failure(s), avg {(self.avg_latency or 0) * 1000:.0f} ms); re-running discovery")
+            self.last_selected = time.monotonic()
+            thread = threading.Thread(target=self.select)
+            thread.daemon = True
+            thread.start()
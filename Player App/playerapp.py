@@ -1,48 +1,121 @@
+import time
+STARTUP_TIME = time.monotonic()  # time-to-first-frame is measured from here
 import tkinter as tk
 from tkinter import ttk
-import cv2
-import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import os
-import time
 import threading
 import platform
+import random
 import subprocess
 from datetime import datetime
-import websocket
+from urllib.parse import urlparse
 import queue
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
 import hashlib
 import vlc
 import sys
+from download_manager import DownloadManager
+from media_cache import MediaCache
+from state_reporter import PlaybackStateReporter
+from frame_renderer import FrameRenderer, FrameCache
+from compositor import Compositor
+from display_backends import TkBackend
+from deadline_scheduler import DeadlineScheduler
+from decode_profile import DecodeProfile
+from ws_client import ReconnectingWebSocket
+from player_discovery import PeerDiscovery, PlayerDiscovery, CmsSelector
+from peer_share import PeerMediaServer
+from metrics import Metrics, MetricsServer
+from playlist_diff import PlaylistDiff, media_key, item_duration, reuse_local_paths, map_playhead, next_surviving_index
 
 # Configuration
 # IMPORTANT: Replace "YOUR_SERVER_IP" with the actual IP address of your backend server.
 # For example: "http://192.168.1.100:4000/"
+# This is the default; LAN discovery may pick a faster CMS or edge cache (see CmsSelector)
 BACKEND_URL = "http://10.52.54.220:4000/"
-WS_URL = f"ws://{BACKEND_URL.split('//')[1].split(':')[0]}:4000"
 
 CACHE_DIR = "media_cache"
 CONFIG_FILE = "player_config.json"
 SCHEDULE_CACHE_FILE = "current_schedule.json"
 DEVICE_INFO_FILE = "device_info.json"
+DECODE_PROFILE_FILE = "decode_profile.json"
+CMS_CHOICE_FILE = "cms_choice.json"
 LOGO_PATH = "KIDS Logo.png"
 
+SCHEDULE_POLL_INTERVAL = 5  # seconds between conditional schedule polls
+# While the WebSocket is confirmed, content-changed pushes drive sync; polling is only a safety net
+WS_SAFETY_POLL_INTERVAL = 300
+WS_PING_INTERVAL = 20
+WS_PING_TIMEOUT = 10
+WS_BACKOFF_MAX = 60
+# A broadcast content-changed makes every player fetch; spread those fetches out
+FANOUT_JITTER_SECONDS = 3
+# Smaller assets are not worth a peer query round trip
+PEER_MIN_BYTES = 1024 * 1024
+# (connect, read) timeouts for peer downloads: a peer that went away costs a second
+PEER_TIMEOUTS = (1, 30)
+DEFAULT_METRICS_PORT = 9108
+DEFAULT_CACHE_MAX_BYTES = 4 * 1024 * 1024 * 1024
+DEFAULT_FRAME_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_IMAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+TEXT_SLIDE_CACHE_SLOTS = 4
+
+# Ticker scroll rate for CMS speed 1x; the CMS sends a 1x-5x multiplier
+TICKER_PIXELS_PER_SECOND = 60
+TICKER_FRAME_MS = 16
+TICKER_GAP = 100
+
+# Deadline scheduler intervals (seconds)
+VIDEO_TICK_INTERVAL = 1        # progress report + lost-event watchdog while a video plays
+PREROLL_LEAD_SECONDS = 3       # open the next clip this long before the current one ends
+DECODE_BENCHMARK_WINDOW = 15   # a benchmark clip plays for up to BENCHMARK_SECONDS * 3 + 5 seconds
+FAILED_MEDIA_RETRY = 0.1
+HEARTBEAT_INTERVAL = 60
+LOGO_CHECK_INTERVAL = 10
+OVERLAY_CHECK_INTERVAL = 5
+SYNC_SAFETY_INTERVAL = 5       # fallback drain of background queues if a wake-up was lost
+
+# (connect, read) timeouts per CMS call; playback state is latency sensitive
+CMS_TIMEOUTS = {
+    'register': (3, 10),
+    'auth': (3, 10),
+    'schedule': (3, 10),
+    'state': (0.5, 1),
+    'download': (5, 60),
+}
+
 # Ensure cache directory exists
 os.makedirs(CACHE_DIR, exist_ok=True)
 
 class UltraPlayerManager:
-    def __init__(self):
+    def __init__(self, screen_size=None):
+        self.metrics = Metrics()
         self.player_id = None
         self.token = None
         self.ws = None
         self.connected = False
+        self.needs_auth = False
         self.config = self.load_config()
-        self.device_info = self.detect_device_info()
+        self.device_info = self.detect_device_info(screen_size)
+        self.session = self.create_session()
+        self.cms = CmsSelector(
+            # Probes use a session without automatic retries, so a dead candidate fails fast
+            self.config.get('backendUrl', BACKEND_URL), CMS_CHOICE_FILE, requests.Session(),
+            discovery=PlayerDiscovery(None, broadcast_address=self.config.get('discoveryBroadcastAddress', '<broadcast>'))
+            if self.config.get('cmsDiscovery', True) else None,
+            on_change=self.on_cms_change
+        )
         
         self.force_content_refresh = False
         self.current_playing_schedule_id = None
+        # Startup metrics, reported with every heartbeat
+        self.time_to_first_frame_ms = None
+        self.boot_source = None
         self.last_content_hash = ""
         self.last_ticker_hash = ""
         
@@ -53,15 +126,27 @@ class UltraPlayerManager:
         self.show_ticker = True
         self.ticker_speed = 2
         self.ticker_update_queue = queue.Queue()
+        # Wakes the UI thread after queueing an update; set by UltraDisplayApp
+        self.notify_ui = lambda: None
         
         self.show_logo = True
         
         self.content_update_queue = []
+        self.schedule_pushes = []
         self.content_update_lock = threading.Lock()
+        self.content_update_event = threading.Event()
+        
+        self.state_reporter = PlaybackStateReporter(
+            self.send_state_batch, self.post_playback_state,
+            interval=float(self.config.get('stateReportInterval', 1.0))
+        )
+        self.state_reporter.start()
         
         self.vlc_instance = None
         self.vlc_player = None
         self.init_vlc()
+        self.decode_validation_thread = None
+        self.decode_validation_done = False
         
         self.load_logo()
     
@@ -69,14 +154,18 @@ class UltraPlayerManager:
         """Initialize VLC with optimal settings and a permanent logo overlay"""
         try:
             logo_path = os.path.abspath(LOGO_PATH)
+            # Decoder and caching flags default to the probed decode profile; player_config.json can override them
+            hw_decode = self.config.get('vlcHardwareDecode', self.decode_profile.hw_decode_flag())
+            caching_ms = int(self.config.get('vlcCachingMs', 1500))
             vlc_args = [
                 '--intf', 'dummy',
                 '--no-video-title-show',
                 '--quiet',
-                '--avcodec-hw=any',
-                '--network-caching=1500',
-                '--file-caching=1500'
+                f'--avcodec-hw={hw_decode}',
+                f'--network-caching={caching_ms}',
+                f'--file-caching={caching_ms}'
             ]
+            vlc_args.extend(self.config.get('vlcExtraArgs', []))
 
             if os.path.exists(logo_path):
                 print("✅ Logo file found. Enabling video overlay.")
@@ -100,6 +189,26 @@ class UltraPlayerManager:
             self.vlc_instance = None
 
     
+    def create_session(self):
+        """One pooled keep-alive session for all CMS traffic.
+
+        Idempotent requests are retried with exponential backoff on connection
+        errors and 502/503/504; POSTs are never retried automatically.
+        """
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            raise_on_status=False
+        )
+        pool_size = int(self.config.get('downloadWorkers', 4)) + 4
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
     def load_config(self):
         try:
             if os.path.exists(CONFIG_FILE):
@@ -116,7 +225,19 @@ class UltraPlayerManager:
         except Exception as e:
             print(f"Failed to save config: {e}")
     
-    def detect_device_info(self):
+    def load_device_info(self):
+        try:
+            if os.path.exists(DEVICE_INFO_FILE):
+                with open(DEVICE_INFO_FILE, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Failed to load device info: {e}")
+        return None
+
+    def detect_device_info(self, screen_size=None):
+        """Describe this device. screen_size comes from the app's own Tk root;
+        without it the cached device_info.json is reused, and only a first boot
+        pays for a throwaway Tk probe."""
         device_info = {
             'screen_width': 1920,
             'screen_height': 1080,
@@ -129,23 +250,66 @@ class UltraPlayerManager:
             'architecture': platform.machine()
         }
 
-        try:
-            # Use Tkinter for reliable, cross-platform screen size detection
-            root = tk.Tk()
-            root.withdraw() # Hide the main window
-            device_info['screen_width'] = root.winfo_screenwidth()
-            device_info['screen_height'] = root.winfo_screenheight()
-            root.destroy()
-        except Exception as e:
-            print(f"Could not detect display info using Tkinter: {e}")
+        cached = self.load_device_info()
+        if screen_size:
+            device_info['screen_width'], device_info['screen_height'] = screen_size
+        elif cached and cached.get('screen_width') and cached.get('screen_height'):
+            device_info['screen_width'] = cached['screen_width']
+            device_info['screen_height'] = cached['screen_height']
+        else:
+            try:
+                # Use Tkinter for reliable, cross-platform screen size detection
+                root = tk.Tk()
+                root.withdraw() # Hide the main window
+                device_info['screen_width'] = root.winfo_screenwidth()
+                device_info['screen_height'] = root.winfo_screenheight()
+                root.destroy()
+            except Exception as e:
+                print(f"Could not detect display info using Tkinter: {e}")
 
+        self.decode_profile = DecodeProfile(
+            DECODE_PROFILE_FILE, os.path.join(CACHE_DIR, "benchmark"),
+            (device_info['screen_width'], device_info['screen_height'])
+        )
+        device_info['decode'] = self.decode_profile.summary()
 
-        with open(DEVICE_INFO_FILE, 'w') as f:
-            json.dump(device_info, f, indent=2)
-        
-        print(f"📺 Display detected: {device_info['screen_width']}x{device_info['screen_height']}")
+        if device_info != cached:
+            with open(DEVICE_INFO_FILE, 'w') as f:
+                json.dump(device_info, f, indent=2)
+            print(f"📺 Display detected: {device_info['screen_width']}x{device_info['screen_height']}")
+        else:
+            print(f"📺 Display unchanged: {device_info['screen_width']}x{device_info['screen_height']} (cached device info)")
+        print(f"🎞️ Hardware decode: {', '.join(device_info['decode']['hwAccel']) or 'none'} ({', '.join(device_info['decode']['hwCodecs']) or 'software only'})")
         return device_info
     
+    def start_decode_validation(self, idle):
+        """Benchmark the decode profile once per device, in the background.
+
+        Started at idle points (waiting screen, image and text slides); the
+        benchmark pauses as soon as idle() turns False, so it never competes
+        with video playback for the decoder (and never measures under that
+        load). Finished codecs are kept, so the next idle spell picks up
+        where this one stopped. A run that completes is not repeated in this
+        process, even if a codec could not be validated.
+        """
+        if self.decode_profile.validated or self.decode_validation_done or not self.config.get('decodeBenchmark', True):
+            return
+        if self.decode_validation_thread and self.decode_validation_thread.is_alive():
+            return
+
+        def validate():
+            try:
+                self.decode_validation_done = self.decode_profile.validate(idle) is not None
+                self.device_info['decode'] = self.decode_profile.summary()
+                with open(DEVICE_INFO_FILE, 'w') as f:
+                    json.dump(self.device_info, f, indent=2)
+            except Exception as e:
+                print(f"Decode benchmark failed: {e}")
+
+        self.decode_validation_thread = threading.Thread(target=validate)
+        self.decode_validation_thread.daemon = True
+        self.decode_validation_thread.start()
+    
     def load_logo(self):
         try:
             if os.path.exists(LOGO_PATH):
@@ -177,7 +341,7 @@ class UltraPlayerManager:
                 "name": self.config.get("name", f"Display-{platform.node()}")
             }
             
-            response = requests.post(f"{BACKEND_URL}players/register", json=payload, timeout=10)
+            response = self.session.post(f"{self.backend_url}players/register", json=payload, timeout=CMS_TIMEOUTS['register'])
             if response.status_code == 200:
                 data = response.json()
                 self.player_id = data['playerId']
@@ -204,7 +368,7 @@ class UltraPlayerManager:
                 "token": self.config['token']
             }
             
-            response = requests.post(f"{BACKEND_URL}players/auth", json=payload, timeout=10)
+            response = self.session.post(f"{self.backend_url}players/auth", json=payload, timeout=CMS_TIMEOUTS['auth'])
             if response.status_code == 200:
                 self.player_id = self.config['playerId']
                 self.token = self.config['token']
@@ -212,49 +376,88 @@ class UltraPlayerManager:
                 return True
             else:
                 print("Authentication failed, need to re-register")
+                self.needs_auth = True
                 return False
         except Exception as e:
             print(f"Authentication error: {e}")
             return False
     
-    def connect_websocket(self):
+    def ensure_registered(self):
+        """Authenticate with the saved credentials; register only if the CMS
+        rejected them (or there are none), never just because it was unreachable."""
+        if self.authenticate():
+            self.needs_auth = False
+            return True
+        if self.needs_auth or not self.config.get('playerId'):
+            if self.register_player():
+                self.needs_auth = False
+                return True
+        return False
+
+    @property
+    def backend_url(self):
+        return self.cms.url
+
+    def ws_url(self):
+        parsed = urlparse(self.backend_url)
+        return f"{'wss' if parsed.scheme == 'https' else 'ws'}://{parsed.netloc}"
+
+    def on_cms_change(self, url):
+        # Move the WebSocket over to the newly selected server
+        if self.ws:
+            self.ws.reconnect()
+
+    def select_cms(self):
+        """Prefer the cached CMS choice if it still answers, otherwise discover and probe"""
+        if self.cms.discovery and not self.cms.use_cached():
+            self.cms.select()
+
+    def prepare_ws_connect(self):
+        """Runs before every WebSocket (re)connect attempt"""
+        if self.needs_auth or not self.player_id:
+            self.ensure_registered()
+        self.ws.url = self.ws_url()
+        return bool(self.player_id)
+
+    def on_ws_open(self, ws):
+        # (Re)subscribe: the server binds this socket to the player on player-connect
+        ws.send(json.dumps({
+            "type": "player-connect",
+            "playerId": self.player_id,
+            "token": self.token,
+            # Ask the CMS to push schedules (or patches) instead of content-changed
+            "capabilities": ["schedule-push"]
+        }))
+
+    def on_ws_message(self, message):
         try:
-            def on_message(ws, message):
-                try:
-                    data = json.loads(message)
-                    self.handle_ws_message(data)
-                except Exception as e:
-                    print(f"WebSocket message error: {e}")
-            
-            def on_error(ws, error):
-                print(f"WebSocket error: {error}")
-                self.connected = False
-            
-            def on_close(ws, close_status_code, close_msg):
-                print("WebSocket connection closed")
-                self.connected = False
-            
-            def on_open(ws):
-                print("WebSocket connected")
-                ws.send(json.dumps({
-                    "type": "player-connect",
-                    "playerId": self.player_id,
-                    "token": self.token
-                }))
-            
-            self.ws = websocket.WebSocketApp(WS_URL,
-                                           on_message=on_message,
-                                           on_error=on_error,
-                                           on_close=on_close,
-                                           on_open=on_open)
-            
-            ws_thread = threading.Thread(target=self.ws.run_forever)
-            ws_thread.daemon = True
-            ws_thread.start()
-            time.sleep(2)
-            
+            data = json.loads(message)
+            self.handle_ws_message(data)
         except Exception as e:
-            print(f"WebSocket connection error: {e}")
+            print(f"WebSocket message error: {e}")
+
+    def on_ws_disconnect(self):
+        self.connected = False
+        # Wake the sync engine so it falls back to regular polling right away
+        self.content_update_event.set()
+
+    def ws_healthy(self):
+        return bool(self.ws and self.connected)
+
+    def connect_websocket(self):
+        if self.ws:
+            return
+        self.ws = ReconnectingWebSocket(
+            self.ws_url(),
+            on_open=self.on_ws_open,
+            on_message=self.on_ws_message,
+            prepare=self.prepare_ws_connect,
+            on_disconnect=self.on_ws_disconnect,
+            ping_interval=WS_PING_INTERVAL,
+            ping_timeout=WS_PING_TIMEOUT,
+            backoff_max=WS_BACKOFF_MAX
+        )
+        self.ws.start()
     
     def handle_ws_message(self, data):
         message_type = data.get('type')
@@ -262,10 +465,16 @@ class UltraPlayerManager:
         if message_type == 'connection-confirmed':
             self.connected = True
             print("✅ WebSocket connection confirmed by server")
+            # Catch up on anything pushed while the socket was down
+            with self.content_update_lock:
+                self.content_update_queue.append('reconnect_check')
+            self.content_update_event.set()
         
         elif message_type == 'connection-rejected':
             print(f"WebSocket connection rejected: {data.get('reason')}")
             self.connected = False
+            # Re-authenticate (or re-register) before the next reconnect attempt
+            self.needs_auth = True
         
         elif message_type == 'player-deleted':
             print("Player has been removed from the system. Shutting down...")
@@ -275,6 +484,13 @@ class UltraPlayerManager:
             print("🚀 INSTANT CONTENT UPDATE RECEIVED!")
             with self.content_update_lock:
                 self.content_update_queue.append('instant_check')
+            self.content_update_event.set()
+        
+        elif message_type in ('schedule-update', 'schedule-patch'):
+            print(f"🚀 Schedule {'patch' if message_type == 'schedule-patch' else 'update'} pushed by CMS")
+            with self.content_update_lock:
+                self.schedule_pushes.append(data)
+            self.content_update_event.set()
         
         elif message_type == 'ticker-updated':
             print("🎯 TICKER SETTINGS UPDATE RECEIVED!")
@@ -285,6 +501,7 @@ class UltraPlayerManager:
                     'enabled': True,
                     'speed': data.get('tickerSpeed', self.ticker_speed)
                 })
+                self.notify_ui()
                 print(f"🎯 Updated ticker text from CMS: '{ticker_text}'")
             else:
                 print("🎯 CMS ticker text empty - keeping default ticker")
@@ -308,12 +525,20 @@ class UltraPlayerManager:
                 return True
         return False
     
+    def take_schedule_pushes(self):
+        with self.content_update_lock:
+            pushes, self.schedule_pushes = self.schedule_pushes, []
+        return pushes
+    
     def send_heartbeat(self):
         try:
             if self.ws and self.connected:
                 self.ws.send(json.dumps({
                     "type": "player-heartbeat",
                     "playerId": self.player_id,
+                    "timeToFirstFrameMs": self.time_to_first_frame_ms,
+                    "bootSource": self.boot_source,
+                    "metrics": self.metrics.summary(),
                     "timestamp": datetime.now().isoformat()
                 }))
         except Exception as e:
@@ -332,28 +557,45 @@ class UltraPlayerManager:
             print(f"Status update error: {e}")
     
     def push_playback_state(self, media_item, status, current_time=0):
+        """Queue a playback state update; delivery happens on the reporter thread"""
         if not self.player_id:
             return
 
         media_type = media_item.get('type') if media_item else 'none'
         relative_url = media_item.get('url', '') if media_item else ''
 
-        state = {
+        self.state_reporter.report({
             'playerId': self.player_id,
             'status': status,
             'mediaType': media_type,
             'mediaUrl': relative_url,
             'currentTime': current_time,
             'timestamp': datetime.now().isoformat()
-        }
-        
+        })
+
+    def send_state_batch(self, states):
+        if not (self.ws and self.connected):
+            return False
         try:
-            requests.post(f"{BACKEND_URL}api/players/{self.player_id}/state", json=state, timeout=2)
+            self.ws.send(json.dumps({
+                "type": "player-state-batch",
+                "playerId": self.player_id,
+                "states": states
+            }))
+            return True
+        except Exception as e:
+            print(f"WebSocket state batch error: {e}")
+            return False
+
+    def post_playback_state(self, state):
+        try:
+            self.session.post(f"{self.backend_url}api/players/{self.player_id}/state", json=state, timeout=CMS_TIMEOUTS['state'])
         except Exception as e:
             print(f"Failed to push player state: {e}")
 
     def shutdown(self):
         self.connected = False
+        self.state_reporter.stop()
         if self.vlc_player:
             try:
                 self.vlc_player.stop()
@@ -363,16 +605,20 @@ class UltraPlayerManager:
             try:
                 self.ws.close()
             except: pass
+        try:
+            self.session.close()
+        except: pass
 
 class UltraDisplayApp:
     def __init__(self):
-        self.player_manager = UltraPlayerManager()
-        
         self.root = tk.Tk()
         self.root.title("Ultra Digital Signage Player")
         self.root.configure(bg='black')
         self.root.attributes('-topmost', True)
         
+        # The player window's own root measures the display; no second Tk instance
+        self.player_manager = UltraPlayerManager(screen_size=(self.root.winfo_screenwidth(), self.root.winfo_screenheight()))
+        
         self.screen_width = self.player_manager.device_info['screen_width']
         self.screen_height = self.player_manager.device_info['screen_height']
         
@@ -390,6 +636,33 @@ class UltraDisplayApp:
         self.content_label = tk.Label(self.display_frame, bg='black', highlightthickness=0)
         self.video_frame = tk.Frame(self.display_frame, bg='black', highlightthickness=0)
         
+        # Two stacked video surfaces: the next clip pre-rolls (paused on its first
+        # frame) in the hidden one, then is raised and resumed for a gapless cut
+        self.video_surfaces = []
+        for _ in range(2):
+            surface = tk.Frame(self.video_frame, bg='black', highlightthickness=0)
+            surface.place(relx=0, rely=0, relwidth=1, relheight=1)
+            self.video_surfaces.append(surface)
+        self.active_surface = 0
+        # A pre-rolled clip holds a second decoder; boards with a single hardware decoder cut cold
+        self.gapless_video = self.player_manager.config.get('gaplessVideo', self.player_manager.decode_profile.concurrent_decodes() > 1)
+        self.preroll_lead = float(self.player_manager.config.get('prerollLeadSeconds', PREROLL_LEAD_SECONDS))
+        self.preroll = None
+        self.transition_started = None
+        
+        # VLC end-of-media/error events: queued by VLC's thread, forwarded to the
+        # Tk thread by the relay thread (media_events + <<MediaEvent>>)
+        self.media_event_queue = queue.SimpleQueue()
+        self.media_events = queue.Queue()
+        self.media_event_relay = None
+        self.video_finished = False
+        
+        # All timed work on the Tk thread is driven by named deadlines
+        self.metrics = self.player_manager.metrics
+        self.scheduler = DeadlineScheduler(self.root, observer=self.observe_tick)
+        self.metrics_server = None
+        self.waiting_screen_shown = False
+        
         self.ticker_frame = tk.Frame(self.root, bg='black', height=self.TICKER_HEIGHT, highlightthickness=0)
         self.ticker_frame.pack(side='bottom', fill='x')
         self.ticker_frame.pack_propagate(False)
@@ -397,23 +670,21 @@ class UltraDisplayApp:
         self.ticker_canvas = tk.Canvas(self.ticker_frame, bg='black', highlightthickness=0, height=self.TICKER_HEIGHT)
         self.ticker_canvas.pack(fill='both', expand=True)
         
-        self.current_media_list = []
-        self.current_index = 0
-        self.current_media_item = None
-        self.media_start_time = 0
-        self.last_schedule_check = 0
-        self.last_heartbeat = 0
-        
-        self.image_cache = {}
-        self.image_preload_thread = None
+        self.init_content_pipeline()
+        # Frames are composed as PIL images; the display backend turns them into Tk photos
+        self.display = TkBackend(self.content_label, self.video_frame, self.ticker_canvas)
         
-        # Ticker Threading
-        self.ticker_thread = None
-        self.ticker_stop_event = threading.Event()
-        self.ticker_coords_queue = queue.Queue()
-        self.ticker_text_id = None
+        # Ticker: one pre-rendered strip scrolled on the Tk thread by elapsed time
+        self.ticker_strip_width = 0
+        self.ticker_offset = 0.0
+        self.ticker_last_frame = None
+        self.ticker_after_id = None
+        self.ticker_pixels_per_speed = float(self.player_manager.config.get('tickerPixelsPerSecond', TICKER_PIXELS_PER_SECOND))
         
         self.root.bind('<Escape>', self.on_escape)
+        self.root.bind('<<SyncUpdate>>', self.on_sync_update)
+        self.root.bind('<<MediaEvent>>', self.on_media_event)
+        self.player_manager.notify_ui = self.notify_ui
         self.root.bind('<KeyPress>', self.on_key_press)
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
@@ -421,18 +692,65 @@ class UltraDisplayApp:
         
         print(f"🚀 Ultra Player initialized: {self.screen_width}x{self.screen_height}")
     
+    def init_content_pipeline(self):
+        """Playlist, sync, download, cache and render state.
+
+        Needs no Tk widgets, only player_manager, metrics and the screen
+        geometry, so the benchmark harness builds the same pipeline headless.
+        """
+        self.current_media_list = []
+        self.current_index = 0
+        self.current_media_item = None
+        self.media_start_time = 0
+        self.last_schedule_check = 0
+
+        # Conditional schedule polling state
+        self.schedule_lock = threading.Lock()
+        self.latest_schedule = None
+        self.schedule_etag = None
+        self.schedule_digest_value = ""
+        self.schedule_long_poll = int(self.player_manager.config.get('scheduleLongPollSeconds', 0))
+
+        # Background sync engine: fetches, diffs and downloads off the Tk thread
+        # and hands fully prepared content over through ready_content_queue
+        self.sync_thread = None
+        self.ready_content_queue = queue.Queue()
+        self.prepared_media_list = []
+        self.download_manager = DownloadManager(
+            max_workers=self.player_manager.config.get('downloadWorkers', 4),
+            per_host_limit=self.player_manager.config.get('downloadsPerHost', 2),
+            timeout=CMS_TIMEOUTS['download'],
+            session=self.player_manager.session
+        )
+        self.media_cache = MediaCache(CACHE_DIR, self.player_manager.config.get('mediaCacheMaxBytes', DEFAULT_CACHE_MAX_BYTES))
+        # LAN peers serve each other cached media; started by start_peer_sharing()
+        self.peer_server = None
+        self.peer_discovery = None
+        self.peer_session = None
+        
+        # Decoded full-screen frames, bounded by bytes and filled ahead of the playhead
+        self.frame_cache = FrameCache(self.player_manager.config.get('imageCacheMaxBytes', DEFAULT_IMAGE_CACHE_MAX_BYTES))
+        self.prefetch_count = int(self.player_manager.config.get('imagePrefetchCount', 3))
+        self.prefetch_window = []
+        self.pending_frames = set()
+        # Render future of the slide the playhead is waiting on, if any
+        self.awaited_frame = None
+        self.frame_loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame-loader")
+        self.rendered_frame_queue = queue.Queue()
+        self.text_slide_cache = FrameCache(TEXT_SLIDE_CACHE_SLOTS * self.screen_width * self.screen_height * 4)
+        self.frame_renderer = FrameRenderer(
+            os.path.join(CACHE_DIR, "frames"), LOGO_PATH,
+            logo_height=int(self.screen_height * 0.08),
+            max_workers=self.player_manager.config.get('renderWorkers'),
+            engine=self.player_manager.config.get('renderEngine', 'auto'),
+            max_bytes=self.player_manager.config.get('frameCacheMaxBytes', DEFAULT_FRAME_CACHE_MAX_BYTES)
+        )
+        self.compositor = Compositor(self.frame_renderer, (self.screen_width, self.screen_height), self.TICKER_HEIGHT)
+
     def create_default_overlays(self):
         print("🎨 Creating default overlays: Ticker")
         self.start_default_ticker()
     
-    def create_translucent_background(self, width, height, alpha=128):
-        try:
-            image = Image.new('RGBA', (width, height), (0, 0, 0, alpha))
-            return ImageTk.PhotoImage(image)
-        except Exception as e:
-            print(f"Error creating translucent background: {e}")
-            return None
-
     def ensure_overlays_visible(self):
         try:
             if not self.ticker_frame.winfo_viewable():
@@ -460,62 +778,317 @@ class UltraDisplayApp:
         self.stop()
     
     def connect_to_cms(self):
-        print("Connecting to CMS...")
-        if not self.player_manager.authenticate():
-            if not self.player_manager.register_player():
-                print("❌ Critical: Failed to connect to CMS. Continuing with defaults...")
-                return True
+        self.player_manager.select_cms()
+        print(f"Connecting to CMS {self.player_manager.backend_url}...")
+        connected = self.player_manager.ensure_registered()
+        if not connected:
+            print("❌ Critical: Failed to connect to CMS. Continuing with defaults, retrying in background...")
+        # Keeps reconnecting (and re-authenticating) in the background from here on
         self.player_manager.connect_websocket()
-        return True
+        return connected
     
     def make_full_url(self, path):
         if path.startswith(('http://', 'https://')):
             return path
-        return f"{BACKEND_URL.rstrip('/')}/{path.lstrip('/')}"
+        return f"{self.player_manager.backend_url.rstrip('/')}/{path.lstrip('/')}"
     
+    def observe_tick(self, name, lateness, duration):
+        self.metrics.observe('tick_seconds', duration, task=name)
+        self.metrics.observe('tick_lateness_seconds', max(0.0, lateness), task=name)
+
+    def start_metrics(self):
+        """Register collectors for existing stats and serve /metrics locally"""
+        metrics = self.metrics
+        metrics.describe('stage_seconds', "Duration of player pipeline stages")
+        metrics.describe('frame_seconds', "Time to put an image or text frame on screen")
+        metrics.describe('transition_seconds', "Video cut request until the new clip is playing")
+        metrics.describe('tick_seconds', "Main loop task run time")
+        metrics.describe('tick_lateness_seconds', "Main loop task start delay past its deadline")
+        metrics.describe('media_requests_total', "Media file requests by source (cache, peer, cms)")
+        metrics.describe('schedule_fetches_total', "Schedule fetches by HTTP status")
+
+        caches = {'frame': self.frame_cache, 'text_slide': self.text_slide_cache}
+        metrics.add_collector('cache_hits_total', 'counter', "Cache hits",
+                              lambda: [({'cache': name}, cache.hits) for name, cache in caches.items()]
+                              + [({'cache': 'frame_disk'}, self.frame_renderer.hits)])
+        metrics.add_collector('cache_misses_total', 'counter', "Cache misses",
+                              lambda: [({'cache': name}, cache.misses) for name, cache in caches.items()]
+                              + [({'cache': 'frame_disk'}, self.frame_renderer.misses)])
+        metrics.add_collector('cache_evictions_total', 'counter', "Frames evicted to stay within the cache budget",
+                              lambda: [({'cache': name}, cache.evictions) for name, cache in caches.items()]
+                              + [({'cache': 'frame_disk'}, self.frame_renderer.evictions)])
+        metrics.add_collector('cache_bytes', 'gauge', "Bytes held per cache",
+                              lambda: [({'cache': name}, cache.total_bytes) for name, cache in caches.items()]
+                              + [({'cache': 'media'}, self.media_cache.total_bytes())])
+        metrics.add_collector('download_bytes_total', 'counter', "Bytes downloaded per host (CMS or peer)",
+                              lambda: [({'host': host}, count) for host, count in list(self.download_manager.bytes_by_host.items())])
+        metrics.add_collector('time_to_first_frame_seconds', 'gauge', "Process start until the first content frame",
+                              lambda: [({}, self.player_manager.time_to_first_frame_ms / 1000)] if self.player_manager.time_to_first_frame_ms is not None else [])
+
+        port = self.player_manager.config.get('metricsPort', DEFAULT_METRICS_PORT)
+        if not port:
+            return
+        try:
+            self.metrics_server = MetricsServer(metrics, host=self.player_manager.config.get('metricsBind', '127.0.0.1'), port=port)
+            self.metrics_server.start()
+        except OSError as e:
+            print(f"⚠️ Metrics endpoint disabled: {e}")
+
+    def start_peer_sharing(self):
+        config = self.player_manager.config
+        if not config.get('peerSharing', True):
+            return
+        try:
+            self.peer_server = PeerMediaServer(self.media_cache, port=config.get('peerPort', 0), max_uploads=config.get('peerUploadSlots', 2))
+            self.peer_discovery = PeerDiscovery(
+                lambda content_hash: self.media_cache.path_for_hash(content_hash) is not None,
+                self.peer_server.port,
+                broadcast_address=config.get('peerBroadcastAddress', '<broadcast>'),
+                timeout=float(config.get('peerQueryTimeout', 0.3))
+            )
+            # No retries: a busy peer answers 503 and the next peer (or the CMS) is tried
+            self.peer_session = requests.Session()
+            adapter = HTTPAdapter(max_retries=0, pool_maxsize=int(config.get('downloadWorkers', 4)))
+            self.peer_session.mount('http://', adapter)
+            self.peer_server.start()
+            self.peer_discovery.start()
+        except Exception as e:
+            print(f"⚠️ Peer sharing disabled: {e}")
+            self.peer_server = None
+            self.peer_discovery = None
+
+    def download_from_peers(self, media_item):
+        """Try LAN peers that already cached this asset; the content hash is verified on insert"""
+        content_hash = (media_item.get('checksum') or '').lower()
+        if not (self.peer_discovery and content_hash and (media_item.get('fileSize') or 0) >= PEER_MIN_BYTES):
+            return None
+
+        name = media_item.get('name', 'Unknown')
+        for peer_url in self.peer_discovery.locate(content_hash):
+            staged_path = self.download_manager.download(peer_url, self.media_cache.incoming_path(media_item), f"{name} (peer)",
+                                                         session=self.peer_session, timeout=PEER_TIMEOUTS)
+            if staged_path:
+                local_path = self.media_cache.insert(media_item, staged_path)
+                if local_path:
+                    print(f"🤝 Got {name} from peer {peer_url.split('/')[2]}")
+                    return local_path
+        return None
+
     def download_media_file(self, media_item):
+        local_path = self.media_cache.lookup(media_item)
+        if local_path:
+            self.metrics.inc('media_requests_total', source='cache')
+            return local_path
+
+        with self.metrics.time('stage_seconds', stage='download_media_file'):
+            local_path = self._download_media_file(media_item)
+        return local_path
+
+    def _download_media_file(self, media_item):
         try:
-            url = self.make_full_url(media_item['url'])
-            filename = f"{media_item['id']}_{os.path.basename(media_item['url'])}"
-            local_path = os.path.join(CACHE_DIR, filename)
-            
-            if os.path.exists(local_path):
-                return local_path
-            
-            print(f"📥 Downloading {media_item.get('name', 'Unknown')}...")
-            with requests.get(url, stream=True, timeout=60) as r:
-                r.raise_for_status()
-                with open(local_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-            print(f"✅ Downloaded: {filename}")
+            local_path = self.download_from_peers(media_item)
+        except Exception as e:
+            local_path = None
+            print(f"⚠️ Peer download failed for {media_item.get('name', 'Unknown')}: {e}")
+        if local_path:
+            self.metrics.inc('media_requests_total', source='peer')
             return local_path
+        self.metrics.inc('media_requests_total', source='cms')
+
+        # The CMS is the fallback (and the only source for unverifiable assets)
+        url = self.make_full_url(media_item['url'])
+        staged_path = self.download_manager.download(url, self.media_cache.incoming_path(media_item), media_item.get('name', 'Unknown'))
+        if not staged_path:
+            return None
+        try:
+            return self.media_cache.insert(media_item, staged_path)
         except Exception as e:
-            print(f"❌ Failed to download {media_item.get('name', 'Unknown')}: {e}")
+            print(f"❌ Failed to cache {media_item.get('name', 'Unknown')}: {e}")
             return None
     
-    def fetch_schedule(self):
+    def schedule_digest(self, schedule_data):
+        """Stable hash of a schedule, ignoring the per-request serverTime"""
+        content = {k: v for k, v in schedule_data.items() if k != 'serverTime'}
+        return hashlib.md5(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+    def store_schedule(self, schedule_data):
+        """Keep the latest schedule; only touch the cache file when it changed"""
+        digest = self.schedule_digest(schedule_data)
+        if digest == self.schedule_digest_value:
+            return False
+
+        try:
+            tmp_path = SCHEDULE_CACHE_FILE + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(schedule_data, f, separators=(',', ':'))
+            os.replace(tmp_path, SCHEDULE_CACHE_FILE)
+        except Exception as e:
+            print(f"Failed to write schedule cache: {e}")
+
+        with self.schedule_lock:
+            self.latest_schedule = schedule_data
+            self.schedule_digest_value = digest
+        return True
+
+    def fetch_schedule(self, wait=0):
+        """Conditionally fetch the schedule.
+
+        Sends If-None-Match with the last ETag so an unchanged schedule costs a
+        304. With wait > 0 the CMS holds the request (long poll) until the
+        content changes or the wait expires. Returns True if the schedule changed.
+        """
         try:
             headers = {'Authorization': f"Bearer {self.player_manager.token}"}
-            url = f"{BACKEND_URL}player-schedule/{self.player_manager.player_id}"
-            resp = requests.get(url, headers=headers, timeout=10)
-            
-            if resp.status_code == 200:
-                schedule_data = resp.json()
-                with open(SCHEDULE_CACHE_FILE, 'w') as f:
-                    json.dump(schedule_data, f, indent=2)
-                return schedule_data
+            if self.schedule_etag and self.latest_schedule is not None:
+                headers['If-None-Match'] = self.schedule_etag
+            params = {'wait': wait} if wait else None
+            url = f"{self.player_manager.backend_url}player-schedule/{self.player_manager.player_id}"
+            connect_timeout, read_timeout = CMS_TIMEOUTS['schedule']
+            started = time.monotonic()
+            resp = self.player_manager.session.get(url, headers=headers, params=params, timeout=(connect_timeout, read_timeout + wait))
+            # Feeds CMS re-selection; a long poll's duration says nothing about latency
+            elapsed = time.monotonic() - started
+            self.player_manager.cms.report(resp.status_code < 500, None if wait else elapsed)
+            self.metrics.inc('schedule_fetches_total', result=str(resp.status_code))
+            if not wait:
+                self.metrics.observe('stage_seconds', elapsed, stage='fetch_schedule')
+
+            if resp.status_code == 304:
+                return False
+            elif resp.status_code == 200:
+                self.schedule_etag = resp.headers.get('ETag')
+                return self.store_schedule(resp.json())
             elif resp.status_code == 401:
                 print("Authentication failed - re-authenticating...")
                 if self.player_manager.authenticate():
-                    return self.fetch_schedule()
+                    return self.fetch_schedule(wait)
             else:
                 print(f"Failed to fetch schedule: HTTP {resp.status_code}")
-            return self.load_cached_schedule()
         except Exception as e:
             print(f"Failed to fetch schedule: {e}")
-            return self.load_cached_schedule()
-    
+            self.player_manager.cms.report(False)
+            self.metrics.inc('schedule_fetches_total', result='error')
+
+        # Offline: fall back to the cached schedule once
+        if self.latest_schedule is None:
+            cached = self.load_cached_schedule()
+            if cached:
+                with self.schedule_lock:
+                    self.latest_schedule = cached
+                    self.schedule_digest_value = self.schedule_digest(cached)
+                return True
+        return False
+
+    def fanout_delay(self):
+        return random.uniform(0, float(self.player_manager.config.get('fanoutJitterSeconds', FANOUT_JITTER_SECONDS)))
+
+    def apply_schedule_push(self, push):
+        """Apply a schedule pushed over the WebSocket.
+
+        A schedule-patch replaces top-level keys of the version it was built
+        against. Returns True/False like fetch_schedule(), or None when the
+        patch does not apply to what this player holds (HTTP fetch needed).
+        """
+        with self.schedule_lock:
+            current = self.latest_schedule
+        if push.get('type') == 'schedule-update':
+            schedule_data = push.get('schedule')
+        elif current is not None and push.get('baseVersion') == self.schedule_etag:
+            schedule_data = dict(current)
+            schedule_data.update(push.get('patch', {}))
+            for key in push.get('removed', []):
+                schedule_data.pop(key, None)
+        else:
+            return None
+
+        if not schedule_data:
+            return None
+        self.schedule_etag = push.get('version')
+        return self.store_schedule(schedule_data)
+
+    def boot_from_cache(self):
+        """Offline-first boot: queue the last known schedule with whatever media
+        is already cached, before the CMS has even been contacted."""
+        schedule_data = self.load_cached_schedule()
+        if not schedule_data:
+            return False
+
+        print("⚡ Booting from cached schedule")
+        self.store_schedule(schedule_data)
+        if self.prepare_content(schedule_data, offline=True):
+            # Fetch what was not cached once the CMS is reachable
+            self.player_manager.force_content_refresh = True
+        return True
+
+    def _sync_loop(self):
+        """Background sync engine: fetch, diff and download without touching Tk"""
+        self.media_cache.migrate_legacy_files()
+        if self.boot_from_cache():
+            self.player_manager.boot_source = 'cache'
+
+        # Auth/registration happen here, so they never delay the first frame
+        if not self.connect_to_cms():
+            print("⚠️ CMS connection failed - continuing with default overlays")
+        print(f"🚀 Connected as Player ID: {self.player_manager.player_id}")
+
+        while not self.is_destroying:
+            try:
+                instant_update_triggered = False
+                ws_healthy = self.player_manager.ws_healthy()
+                pushes = self.player_manager.take_schedule_pushes()
+                if pushes:
+                    # Pushed schedules need no HTTP round trip unless a patch is out of sync
+                    changed = False
+                    for push in pushes:
+                        result = self.apply_schedule_push(push)
+                        if result is None:
+                            print("↪️ Schedule patch does not match local version, fetching over HTTP")
+                            time.sleep(self.fanout_delay())
+                            changed = self.fetch_schedule() or changed
+                            break
+                        changed = result or changed
+                    # A push supersedes any pending content-changed re-check
+                    self.player_manager.check_for_instant_updates()
+                    instant_update_triggered = True
+                elif self.schedule_long_poll and not ws_healthy:
+                    started = time.time()
+                    changed = self.fetch_schedule(wait=self.schedule_long_poll)
+                    # Back off if the CMS answered immediately (error or no long-poll support)
+                    if not changed and time.time() - started < 1:
+                        time.sleep(SCHEDULE_POLL_INTERVAL)
+                else:
+                    instant_update_triggered = self.player_manager.check_for_instant_updates()
+                    if instant_update_triggered:
+                        # Every player got the same broadcast: don't all hit the CMS at once
+                        time.sleep(self.fanout_delay())
+                    changed = self.fetch_schedule()
+                self.last_schedule_check = time.time()
+
+                if changed or self.player_manager.force_content_refresh:
+                    with self.schedule_lock:
+                        schedule_data = self.latest_schedule
+                    if schedule_data:
+                        self.prepare_content(schedule_data, instant_update_triggered)
+                elif instant_update_triggered:
+                    print("✅ Instant update checked. Schedule unchanged.")
+            except Exception as e:
+                print(f"Error in sync engine: {e}")
+
+            ws_healthy = self.player_manager.ws_healthy()
+            if ws_healthy or not self.schedule_long_poll:
+                # Sleep until the next poll, or wake early on a content-changed push.
+                # With a healthy WebSocket the pushes are the sync path and polling backs off.
+                interval = WS_SAFETY_POLL_INTERVAL if ws_healthy else SCHEDULE_POLL_INTERVAL
+                self.player_manager.content_update_event.wait(interval)
+                self.player_manager.content_update_event.clear()
+
+    def start_sync_engine(self):
+        mode = f"long-poll wait={self.schedule_long_poll}s" if self.schedule_long_poll else f"poll every {SCHEDULE_POLL_INTERVAL}s"
+        print(f"🔁 Starting background sync engine ({mode})")
+        self.sync_thread = threading.Thread(target=self._sync_loop)
+        self.sync_thread.daemon = True
+        self.sync_thread.start()
+
     def load_cached_schedule(self):
         try:
             if os.path.exists(SCHEDULE_CACHE_FILE):
@@ -525,168 +1098,246 @@ class UltraDisplayApp:
             print(f"Failed to load cached schedule: {e}")
         return None
     
-    def download_all_media(self, media_list):
+    def cached_media_file(self, media_item):
+        return self.media_cache.lookup(media_item)
+
+    def download_all_media(self, media_list, offline=False):
+        # Fetch the rendition this device decodes best, not always the HEVC one
+        downloadable = []
+        for media_item in media_list:
+            if media_item.get('type') in ['image', 'video'] and not media_item.get('local_path'):
+                downloadable.append((media_item, self.player_manager.decode_profile.choose_rendition(media_item)))
+
+        # The same asset can appear several times in a playlist: fetch it once
+        unique = {}
+        for _, source in downloadable:
+            unique.setdefault(MediaCache.source_key(source), source)
+        fetch = self.cached_media_file if offline else self.download_media_file
+        local_paths = dict(zip(unique, self.download_manager.map(fetch, unique.values())))
+        for media_item, source in downloadable:
+            media_item['local_path'] = local_paths[MediaCache.source_key(source)]
+
         local_media = []
         for media_item in media_list:
             if media_item.get('type') in ['image', 'video']:
-                if 'h265_url' in media_item and media_item['h265_url']:
-                    media_item['url'] = media_item['h265_url']
-                
-                local_path = self.download_media_file(media_item)
-                if local_path:
-                    media_item['local_path'] = local_path
+                if media_item.get('local_path'):
                     local_media.append(media_item)
             else:
                 local_media.append(media_item)
         return local_media
         
+    def content_size(self):
+        return self.compositor.content_size()
+
     def preload_images(self, media_list):
-        def _preload():
-            for media_item in media_list:
-                if self.is_destroying:
+        """Warm the on-disk frame cache in the process pool from the playhead on,
+        as many frames as its budget holds, then decode only the next few into memory.
+
+        Warming past the budget would evict the frames needed first; the rest
+        are rendered as the prefetch window reaches them.
+        """
+        size = self.content_size()
+        limit = self.frame_renderer.capacity(size) or len(media_list)
+        start = self.current_index % len(media_list) if media_list else 0
+        submitted = set()
+        for media_item in media_list[start:] + media_list[:start]:
+            image_path = media_item.get('local_path')
+            if len(submitted) >= limit:
+                break
+            if media_item.get('type') == 'image' and image_path and image_path not in submitted:
+                submitted.add(image_path)
+                future = self.frame_renderer.submit(image_path, size)
+                if not future.done():
+                    started = time.perf_counter()
+                    future.add_done_callback(lambda _, started=started: self.metrics.observe(
+                        'stage_seconds', time.perf_counter() - started, stage='render_frame'))
+        self.prefetch_frames()
+
+    def frame_bytes(self):
+        return self.display.surface_bytes(self.content_size())
+
+    def upcoming_image_paths(self):
+        """Image paths in playback order from the playhead, as many as fit the budget"""
+        limit = min(self.prefetch_count, max(1, self.frame_cache.max_bytes // self.frame_bytes()))
+        paths = []
+        count = len(self.current_media_list)
+        for offset in range(count):
+            media_item = self.current_media_list[(self.current_index + offset) % count]
+            image_path = media_item.get('local_path')
+            if media_item.get('type') == 'image' and image_path and image_path not in paths:
+                paths.append(image_path)
+                if len(paths) >= limit:
                     break
-                if media_item.get('type') == 'image' and media_item.get('local_path') not in self.image_cache:
-                    try:
-                        self.process_image(media_item)
-                    except Exception as e:
-                        print(f"Error preloading image {media_item.get('name')}: {e}")
-        
-        if self.image_preload_thread and self.image_preload_thread.is_alive():
-            self.image_preload_thread.join()
-            
-        self.image_preload_thread = threading.Thread(target=_preload)
-        self.image_preload_thread.daemon = True
-        self.image_preload_thread.start()
+        return paths
+
+    def prefetch_frames(self):
+        """Evict frames behind the playhead and start decoding the ones ahead (Tk thread)"""
+        self.prefetch_window = self.upcoming_image_paths()
+        self.frame_cache.retain(self.prefetch_window)
+        for image_path in self.prefetch_window:
+            if image_path not in self.frame_cache and image_path not in self.pending_frames:
+                self.pending_frames.add(image_path)
+                self.frame_loader.submit(self._decode_frame, image_path, self.content_size())
+
+    def _decode_frame(self, image_path, size):
+        """Frame loader thread: wait for the rendered frame and decode it"""
+        frame = None
+        try:
+            with self.metrics.time('stage_seconds', stage='decode_frame'):
+                frame = self.compositor.image_frame(image_path, size)
+        except Exception as e:
+            print(f"Error preloading image {os.path.basename(image_path)}: {e}")
+        self.rendered_frame_queue.put((image_path, frame))
+        self.notify_ui()
+
+    def load_rendered_frames(self):
+        """Turn frames decoded by the loader thread into display surfaces (Tk thread)"""
+        try:
+            while True:
+                image_path, frame = self.rendered_frame_queue.get_nowait()
+                self.pending_frames.discard(image_path)
+                if frame and image_path in self.prefetch_window and image_path not in self.frame_cache:
+                    self.frame_cache.put(image_path, self.display.surface(frame), self.frame_bytes())
+        except queue.Empty:
+            pass
 
     def process_image(self, media_item):
         image_path = media_item.get('local_path')
         if not image_path or not os.path.exists(image_path):
             return None
 
-        content_width = self.screen_width
-        content_height = self.screen_height - self.TICKER_HEIGHT
-
-        with Image.open(image_path) as img:
-            img = img.convert('RGB')
-            img_ratio = img.width / img.height
-            content_ratio = content_width / content_height
-            if img_ratio > content_ratio:
-                new_width = content_width
-                new_height = int(content_width / img_ratio)
-            else:
-                new_height = content_height
-                new_width = int(content_height * img_ratio)
-            
-            img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            final_image = Image.new('RGB', (content_width, content_height), 'black')
-            paste_x = (content_width - new_width) // 2
-            paste_y = (content_height - new_height) // 2
-            final_image.paste(img_resized, (paste_x, paste_y))
-            
-            if self.player_manager.logo:
-                logo = self.player_manager.logo
-                logo_x = content_width - logo.width - 20
-                logo_y = 20
-                final_image.paste(logo, (logo_x, logo_y), mask=logo)
-            
-            photo = ImageTk.PhotoImage(final_image)
-            self.image_cache[image_path] = photo
-            return photo
+        with self.metrics.time('stage_seconds', stage='process_image'):
+            with self.compositor.image_frame(image_path) as frame:
+                photo = self.display.surface(frame)
+        self.frame_cache.put(image_path, photo, self.frame_bytes())
+        return photo
     
-    def display_image(self, media_item):
+    def frame_ready(self, media_item):
+        """Whether the slide's frame is rendered. If it is still in the pool, the
+        finished render wakes the Tk thread (on_sync_update) to show it."""
         image_path = media_item.get('local_path')
-        photo = self.image_cache.get(image_path)
-        
-        if not photo:
-            photo = self.process_image(media_item)
-        
-        if photo:
-            self.video_frame.pack_forget()
-            self.content_label.configure(image=photo, text="")
-            self.content_label.image = photo
-            self.content_label.pack(fill='both', expand=True)
-            self.root.after(50, self.ensure_overlays_visible)
+        if not image_path or not os.path.exists(image_path):
+            return True  # process_image() reports it
+        future = self.frame_renderer.submit(image_path, self.content_size())
+        if future.done():
             return True
+        print(f"⏳ Waiting for {media_item.get('name', 'Image')} to render")
+        self.awaited_frame = future
+        future.add_done_callback(lambda _: self.notify_ui())
+        return False
+
+    def display_image(self, media_item):
+        """Show an image slide: True on success, False on failure, None while
+        its frame is still rendering (never waited for on the Tk thread)"""
+        started = time.perf_counter()
+        image_path = media_item.get('local_path')
+        try:
+            photo = self.frame_cache.get(image_path)
+            if not photo:
+                if not self.frame_ready(media_item):
+                    return None
+                photo = self.process_image(media_item)
+
+            if photo:
+                self.display.show(photo)
+                self.root.after(50, self.ensure_overlays_visible)
+                self.metrics.observe('frame_seconds', time.perf_counter() - started, type='image')
+                return True
+        except Exception as e:
+            # A corrupt image or failed render skips this item, not the playlist
+            print(f"Error displaying image {media_item.get('name', 'Unknown')}: {e}")
         return False
     
     def display_text(self, text):
+        started = time.perf_counter()
         try:
-            content_width = self.screen_width
-            content_height = self.screen_height - self.TICKER_HEIGHT
-
-            final_image = Image.new('RGB', (content_width, content_height), 'black')
-            draw = ImageDraw.Draw(final_image)
-            
-            font_paths = [
-                "arial.ttf",
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-                "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"
-            ]
-            
-            try:
-                font_size = max(24, content_height // 25)
-                font = None
-                for font_path in font_paths:
-                    try:
-                        font = ImageFont.truetype(font_path, font_size)
-                        break
-                    except: continue
-                if not font:
-                    font = ImageFont.load_default()
-            except:
-                font = ImageFont.load_default()
-            
-            words = text.split()
-            lines = []
-            current_line = ""
+            # Slides are cached by (text, screen size, logo), so repeats cost nothing
+            key = (text, self.content_size(), self.player_manager.logo_mtime)
+            photo = self.text_slide_cache.get(key)
+            if not photo:
+                photo = self.display.surface(self.compositor.text_frame(text, self.player_manager.logo))
+                self.text_slide_cache.put(key, photo, self.frame_bytes())
             
-            for word in words:
-                test_line = (current_line + " " + word).strip()
-                try:
-                    bbox = draw.textbbox((0, 0), test_line, font=font)
-                    text_width = bbox[2] - bbox[0]
-                except:
-                    text_width, _ = draw.textsize(test_line, font=font)
-                
-                if text_width < content_width * 0.9:
-                    current_line = test_line
-                else:
-                    lines.append(current_line)
-                    current_line = word
-            if current_line:
-                lines.append(current_line)
-            
-            line_height = font_size + 10
-            total_height = len(lines) * line_height
-            y = (content_height - total_height) / 2
-            
-            for line in lines:
-                try:
-                    bbox = draw.textbbox((0, 0), line, font=font)
-                    line_width = bbox[2] - bbox[0]
-                except:
-                    line_width, _ = draw.textsize(line, font=font)
-                x = (content_width - line_width) / 2
-                draw.text((x, y), line, font=font, fill="white")
-                y += line_height
-            
-            if self.player_manager.logo:
-                logo = self.player_manager.logo
-                logo_x = content_width - logo.width - 20
-                logo_y = 20
-                final_image.paste(logo, (logo_x, logo_y), mask=logo)
-
-            photo = ImageTk.PhotoImage(final_image)
-            self.video_frame.pack_forget()
-            self.content_label.configure(image=photo, text="")
-            self.content_label.image = photo
-            self.content_label.pack(fill='both', expand=True)
+            if not self.display.show(photo):
+                return True
             self.root.after(50, self.ensure_overlays_visible)
+            self.metrics.observe('frame_seconds', time.perf_counter() - started, type='text')
             return True
         except Exception as e:
             print(f"Error displaying text: {e}")
             return False
     
+    def create_vlc_player(self, video_path, surface, start_paused=False):
+        player = self.player_manager.vlc_instance.media_player_new()
+        
+        wid = surface.winfo_id()
+        try:
+            if platform.system() == 'Windows':
+                player.set_hwnd(wid)
+            else:
+                player.set_xwindow(wid)
+        except Exception as e:
+            print(f"Warning: unable to set window id for VLC: {e}")
+        
+        events = player.event_manager()
+        events.event_attach(vlc.EventType.MediaPlayerEndReached, lambda event: self.post_media_event(player, 'ended'))
+        events.event_attach(vlc.EventType.MediaPlayerEncounteredError, lambda event: self.post_media_event(player, 'error'))
+        
+        media = self.player_manager.vlc_instance.media_new(video_path)
+        if start_paused:
+            # Open and decode up to the first frame, then hold
+            media.add_option(':start-paused')
+        player.set_media(media)
+        
+        try:
+            player.video_set_scale(0)
+            aspect_ratio = f"{self.screen_width}:{self.screen_height}"
+            player.video_set_aspect_ratio(aspect_ratio)
+            player.set_fullscreen(False)
+            player.video_set_crop_geometry(None)
+        except Exception as e:
+            print(f"Video scaling settings error: {e}")
+        return player
+
+    def preroll_next_video(self):
+        """Pre-open the next playlist item in the hidden surface if it is a video"""
+        if not self.gapless_video or self.preroll or not self.current_media_list:
+            return
+        next_item = self.current_media_list[self.current_index % len(self.current_media_list)]
+        video_path = next_item.get('local_path')
+        if next_item.get('type') != 'video' or not video_path or not os.path.exists(video_path):
+            return
+        
+        try:
+            surface_index = 1 - self.active_surface
+            player = self.create_vlc_player(video_path, self.video_surfaces[surface_index], start_paused=True)
+            player.play()
+            self.preroll = {'path': video_path, 'player': player, 'surface': surface_index}
+            print(f"⏩ Pre-rolling next video: {next_item.get('name', 'Unknown')}")
+        except Exception as e:
+            print(f"Error pre-rolling video: {e}")
+
+    def discard_preroll(self):
+        if self.preroll:
+            try: self.preroll['player'].stop()
+            except: pass
+            self.preroll = None
+
+    def watch_transition(self, player, mode):
+        """Log the time from the cut request until the new clip is actually playing"""
+        def on_playing(event):
+            # First time update after the cut; later ones find transition_started cleared
+            if self.transition_started is not None:
+                latency_ms = (time.perf_counter() - self.transition_started) * 1000
+                self.transition_started = None
+                self.metrics.observe('transition_seconds', latency_ms / 1000, mode=mode)
+                print(f"⏱️ Video transition ({mode}): {latency_ms:.1f} ms")
+        
+        try:
+            player.event_manager().event_attach(vlc.EventType.MediaPlayerTimeChanged, on_playing)
+        except Exception as e:
+            print(f"Unable to attach transition timer: {e}")
+
     def display_video(self, media_item):
         """Display video with PERFECT screen fitting and ENSURE overlays visible"""
         try:
@@ -699,121 +1350,84 @@ class UltraDisplayApp:
                 return False
             
             print(f"🎥 Playing video: {media_item.get('name', 'Unknown')}")
+            started = self.transition_started = time.perf_counter()
             
-            self.content_label.pack_forget()
-            self.video_frame.pack(fill='both', expand=True)
+            self.display.show_video()
             
-            if self.player_manager.vlc_player:
-                try: self.player_manager.vlc_player.stop()
-                except: pass
-            
-            self.player_manager.vlc_player = self.player_manager.vlc_instance.media_player_new()
+            old_player = self.player_manager.vlc_player
             
-            self.root.update_idletasks()
-            wid = self.video_frame.winfo_id()
-            
-            try:
-                if platform.system() == 'Windows':
-                    self.player_manager.vlc_player.set_hwnd(wid)
-                else:
-                    self.player_manager.vlc_player.set_xwindow(wid)
-            except Exception as e:
-                print(f"Warning: unable to set window id for VLC: {e}")
-            
-            media = self.player_manager.vlc_instance.media_new(video_path)
-            self.player_manager.vlc_player.set_media(media)
-            
-            try:
-                self.player_manager.vlc_player.video_set_scale(0)
-                aspect_ratio = f"{self.screen_width}:{self.screen_height}"
-                self.player_manager.vlc_player.video_set_aspect_ratio(aspect_ratio)
-                self.player_manager.vlc_player.set_fullscreen(False)
-                self.player_manager.vlc_player.video_set_crop_geometry(None)
-            except Exception as e:
-                print(f"Video scaling settings error: {e}")
-            
-            self.player_manager.vlc_player.play()
+            if self.preroll and self.preroll['path'] == video_path:
+                # Gapless: resume the pre-rolled player, raise its surface, then drop the old one
+                preroll, self.preroll = self.preroll, None
+                self.watch_transition(preroll['player'], "gapless")
+                preroll['player'].set_pause(0)
+                self.video_surfaces[preroll['surface']].lift()
+                self.active_surface = preroll['surface']
+                self.player_manager.vlc_player = preroll['player']
+                if old_player:
+                    try: old_player.stop()
+                    except: pass
+            else:
+                self.discard_preroll()
+                if old_player:
+                    try: old_player.stop()
+                    except: pass
+                
+                self.root.update_idletasks()
+                self.video_surfaces[self.active_surface].lift()
+                self.player_manager.vlc_player = self.create_vlc_player(video_path, self.video_surfaces[self.active_surface])
+                self.watch_transition(self.player_manager.vlc_player, "cold start")
+                self.player_manager.vlc_player.play()
             
             self.root.after(1000, self.ensure_overlays_visible)
+            self.metrics.observe('stage_seconds', time.perf_counter() - started, stage='display_video')
             return True
         except Exception as e:
             print(f"Error playing video: {e}")
             return False
     
-    def _ticker_thread_func(self):
-        """The function that runs in a separate thread to calculate ticker coordinates."""
+    def ticker_pixels_per_second(self):
         try:
-            ticker_text = self.player_manager.ticker_text
-            font_size = max(16, int(self.screen_height * 0.03))
-            
-            # This is a bit of a hack to get text width without a canvas in a thread
-            text_width = len(ticker_text) * (font_size // 2)
-
-            x_pos = self.screen_width + 50
-            
-            while not self.ticker_stop_event.is_set():
-                speed = max(1, int(self.player_manager.ticker_speed))
-                x_pos -= speed
-                
-                if x_pos <= -(text_width + 100):
-                    x_pos = self.screen_width + 50
-                
-                self.ticker_coords_queue.put(x_pos)
-                time.sleep(0.016) # ~60 FPS
-        except Exception as e:
-            print(f"Error in ticker thread: {e}")
+            speed = float(self.player_manager.ticker_speed)
+        except (TypeError, ValueError):
+            speed = 2
+        return max(0.5, speed) * self.ticker_pixels_per_speed
 
-    def _update_ticker_canvas(self):
-        """Safely updates the ticker canvas from the main thread."""
+    def _animate_ticker(self):
+        """Advance the ticker by elapsed time x speed, so late frames do not slow it down"""
+        now = time.perf_counter()
+        elapsed = now - self.ticker_last_frame
+        self.ticker_last_frame = now
+        
+        cycle = self.screen_width + self.ticker_strip_width + TICKER_GAP
+        self.ticker_offset = (self.ticker_offset + elapsed * self.ticker_pixels_per_second()) % cycle
         try:
-            while not self.ticker_coords_queue.empty():
-                x_pos = self.ticker_coords_queue.get_nowait()
-                if self.ticker_text_id:
-                    self.ticker_canvas.coords(self.ticker_text_id, x_pos, self.TICKER_HEIGHT // 2)
-        except queue.Empty:
-            pass
+            self.display.move_ticker(round(self.screen_width - self.ticker_offset))
         except Exception as e:
             print(f"Error updating ticker canvas: {e}")
         
         if not self.is_destroying:
-            self.root.after(16, self._update_ticker_canvas)
+            self.ticker_after_id = self.root.after(TICKER_FRAME_MS, self._animate_ticker)
 
     def start_ticker(self):
-        if self.ticker_thread and self.ticker_thread.is_alive():
-            self.ticker_stop_event.set()
-            self.ticker_thread.join()
-        
-        # Clear previous ticker items from canvas
-        self.ticker_canvas.delete("all")
-        
-        # Setup the canvas items in the main thread
-        bg_photo = self.create_translucent_background(self.screen_width, self.TICKER_HEIGHT, alpha=128)
-        self.ticker_canvas.create_image(0, 0, anchor='nw', image=bg_photo, tags='ticker_bg')
-        self.ticker_canvas.image = bg_photo # Keep a reference
-
-        font_size = max(16, int(self.screen_height * 0.03))
-        self.ticker_text_id = self.ticker_canvas.create_text(
-            self.screen_width, self.TICKER_HEIGHT // 2,
-            text=self.player_manager.ticker_text,
-            fill='white', font=("Arial", font_size, "bold"), anchor='w'
-        )
-        
-        # Start the background thread for calculations
-        self.ticker_stop_event.clear()
-        self.ticker_thread = threading.Thread(target=self._ticker_thread_func)
-        self.ticker_thread.daemon = True
-        self.ticker_thread.start()
+        self.stop_ticker()
+
+        # Render the text once; scrolling only moves this image
+        strip = self.compositor.ticker_strip(self.player_manager.ticker_text)
+        self.ticker_strip_width = strip.width
+        self.display.set_ticker(self.compositor.ticker_background(), strip, self.screen_width)
         
-        # Start the GUI update loop
-        self.root.after(16, self._update_ticker_canvas)
+        self.ticker_offset = 0.0
+        self.ticker_last_frame = time.perf_counter()
+        self.ticker_after_id = self.root.after(TICKER_FRAME_MS, self._animate_ticker)
         
-        print(f"🎪 Ticker started: '{self.player_manager.ticker_text}'")
+        print(f"🎪 Ticker started: '{self.player_manager.ticker_text}' ({self.ticker_strip_width}px, {self.ticker_pixels_per_second():.0f}px/s)")
 
     def stop_ticker(self):
-        self.ticker_stop_event.set()
-        if self.ticker_thread and self.ticker_thread.is_alive():
-            self.ticker_thread.join()
-        print("🛑 Ticker thread stopped.")
+        if self.ticker_after_id:
+            try: self.root.after_cancel(self.ticker_after_id)
+            except: pass
+            self.ticker_after_id = None
 
     def update_ticker(self):
         try:
@@ -826,82 +1440,131 @@ class UltraDisplayApp:
                     self.player_manager.ticker_text = new_text
                 self.player_manager.show_ticker = True
                 self.player_manager.ticker_speed = update.get('speed', self.player_manager.ticker_speed)
-                if (old_text != self.player_manager.ticker_text or old_speed != self.player_manager.ticker_speed):
+                if old_text != self.player_manager.ticker_text:
                     self.start_ticker()
+                if (old_text != self.player_manager.ticker_text or old_speed != self.player_manager.ticker_speed):
+                    # A speed change alone applies on the next frame without re-rendering
                     print(f"🎯 Ticker updated (ALWAYS ENABLED): '{self.player_manager.ticker_text}', Speed={self.player_manager.ticker_speed}")
         except Exception as e:
             print(f"Error updating ticker: {e}")
     
-    def check_schedule(self):
-        now = time.time()
-        instant_update_triggered = self.player_manager.check_for_instant_updates()
-        
-        # Only check if 5 seconds have passed OR an instant update was triggered
-        if now - self.last_schedule_check > 5 or instant_update_triggered:
-            schedule_data = self.fetch_schedule()
-            if not schedule_data:
-                self.last_schedule_check = now
-                return
+    def prepare_content(self, schedule_data, instant_update_triggered=False, offline=False):
+        """Runs on the sync thread: diff the schedule and download new media.
 
-            # --- Create unique hashes for the new content and ticker ---
-            media_list = schedule_data.get("media", [])
-            # A stable representation of media items for accurate comparison
-            media_identifiers = [(item.get('id'), item.get('playlistDuration')) for item in media_list]
-            new_content_hash = hashlib.md5(json.dumps(media_identifiers, sort_keys=True).encode()).hexdigest()
+        The current playlist keeps playing while this runs; the finished media
+        list is queued for apply_ready_content() to swap in on the Tk thread.
+        With offline=True only already cached media is used; returns True if
+        some media was left out because it still has to be downloaded.
+        """
+        # --- Create unique hashes for the new content and ticker ---
+        media_list = [dict(item) for item in schedule_data.get("media", [])]
+        # A stable representation of media items for accurate comparison
+        media_identifiers = [(media_key(item), item_duration(item)) for item in media_list]
+        new_content_hash = hashlib.md5(json.dumps(media_identifiers, sort_keys=True).encode()).hexdigest()
 
-            ticker_text = schedule_data.get("tickerText", "") or self.player_manager.ticker_text
-            ticker_speed = schedule_data.get("tickerSpeed", 2)
-            new_ticker_hash = hashlib.md5(f"{ticker_text}{ticker_speed}".encode()).hexdigest()
+        ticker_text = schedule_data.get("tickerText", "") or self.player_manager.ticker_text
+        ticker_speed = schedule_data.get("tickerSpeed", 2)
+        new_ticker_hash = hashlib.md5(f"{ticker_text}{ticker_speed}".encode()).hexdigest()
 
-            # --- Compare hashes and decide what to update ---
+        # --- Compare hashes and decide what to update ---
 
-            # 1. Check for Ticker updates
-            if new_ticker_hash != self.player_manager.last_ticker_hash:
-                print("🎯 Ticker content has changed. Updating ticker only.")
-                self.player_manager.ticker_update_queue.put({
-                    'text': ticker_text, 'speed': ticker_speed
-                })
-                self.player_manager.last_ticker_hash = new_ticker_hash
+        # 1. Check for Ticker updates
+        if new_ticker_hash != self.player_manager.last_ticker_hash:
+            print("🎯 Ticker content has changed. Updating ticker only.")
+            self.player_manager.ticker_update_queue.put({
+                'text': ticker_text, 'speed': ticker_speed
+            })
+            self.player_manager.last_ticker_hash = new_ticker_hash
+            self.notify_ui()
 
-            # 2. Check for Main Content updates (full reload)
-            current_schedule = schedule_data.get("currentSchedule", {})
-            current_schedule_id = current_schedule.get("id", "") if current_schedule else ""
-            
-            content_changed = new_content_hash != self.player_manager.last_content_hash
-            schedule_id_changed = current_schedule_id != self.player_manager.current_playing_schedule_id
+        # 2. Check for Main Content updates
+        current_schedule = schedule_data.get("currentSchedule", {})
+        current_schedule_id = current_schedule.get("id", "") if current_schedule else ""
+        
+        content_changed = new_content_hash != self.player_manager.last_content_hash
+        schedule_id_changed = current_schedule_id != self.player_manager.current_playing_schedule_id
 
-            if content_changed or schedule_id_changed or self.player_manager.force_content_refresh:
-                reason = "New Schedule Assigned" if schedule_id_changed else "Media Content Updated"
-                print(f"🔄 Full content refresh triggered. Reason: {reason}.")
-                
+        if content_changed or schedule_id_changed or self.player_manager.force_content_refresh:
+            reason = "New Schedule Assigned" if schedule_id_changed else "Media Content Updated"
+            diff = PlaylistDiff(self.prepared_media_list, media_list)
+            print(f"🔄 Content refresh triggered. Reason: {reason}. Changes: {diff.summary()}")
+            
+            # Only assets that are neither in the last playlist nor in the media cache get downloaded
+            missing = [item for item in reuse_local_paths(self.prepared_media_list, media_list)
+                       if not self.media_cache.lookup(self.player_manager.decode_profile.choose_rendition(item))]
+            if missing and not offline:
+                print(f"📥 Downloading {len(missing)} new item(s) in background...")
                 self.player_manager.send_status("downloading")
-                if self.player_manager.vlc_player:
-                    try: self.player_manager.vlc_player.stop()
-                    except: pass
-                
-                self.image_cache.clear()
-                self.current_media_list = self.download_all_media(media_list)
-                self.current_index = 0
-                self.current_media_item = None
-                
-                self.preload_images(self.current_media_list)
-                
-                # Update hashes and IDs after successful reload
-                self.player_manager.current_playing_schedule_id = current_schedule_id
-                self.player_manager.last_content_hash = new_content_hash
-                self.player_manager.force_content_refresh = False
-                
-                if current_schedule:
-                    schedule_name = current_schedule.get("name", "Unknown")
-                    print(f"📺 Loaded schedule: {schedule_name} with {len(self.current_media_list)} items.")
-                    self.player_manager.send_status("playing" if self.current_media_list else "idle")
-                else:
-                    self.player_manager.send_status("idle")
+            ready_media = self.download_all_media(media_list, offline=offline)
+            queued_media, self.prepared_media_list = self.prepared_media_list, ready_media
+            # Keep both the playing and the incoming playlist on disk
+            self.media_cache.evict([item.get('local_path') for item in ready_media + self.current_media_list])
+            self.frame_renderer.prune()
+            
+            # Update hashes and IDs once the new content is fully downloaded
+            self.player_manager.current_playing_schedule_id = current_schedule_id
+            self.player_manager.last_content_hash = new_content_hash
+            self.player_manager.force_content_refresh = False
 
-            elif instant_update_triggered:
-                 print("✅ Instant update checked. No effective changes to content or ticker found.")
+            if not schedule_id_changed and PlaylistDiff(queued_media, ready_media).is_empty():
+                # e.g. a forced refresh that found nothing new to download
+                print("✅ Prepared playlist is unchanged, nothing to apply")
+                return len(ready_media) < len(media_list)
 
-            self.last_schedule_check = now
+            self.ready_content_queue.put({
+                'media': ready_media,
+                'schedule': current_schedule
+            })
+            self.notify_ui()
+            return len(ready_media) < len(media_list)
+
+        elif instant_update_triggered:
+             print("✅ Instant update checked. No effective changes to content or ticker found.")
+        return False
+
+    def apply_ready_content(self):
+        """Runs on the Tk thread: atomically swap in the newest prepared playlist"""
+        ready = None
+        try:
+            while True:
+                ready = self.ready_content_queue.get_nowait()
+        except queue.Empty:
+            pass
+        if ready is None:
+            return
+
+        old_list = self.current_media_list
+        new_list = ready['media']
+        playing_index = self.current_index - 1 if self.current_media_item else -1
+        new_index = map_playhead(old_list, playing_index, new_list)
+
+        if new_index is not None:
+            # The item on screen survived the update: keep it playing and continue
+            # after it in the new order (picking up any new duration)
+            self.current_media_item = new_list[new_index]
+            self.current_index = new_index + 1
+            print(f"▶️ Keeping current item on screen: {self.current_media_item.get('name', 'N/A')}")
+        else:
+            if self.player_manager.vlc_player:
+                try: self.player_manager.vlc_player.stop()
+                except: pass
+            self.discard_preroll()
+            self.current_media_item = None
+            self.current_index = next_surviving_index(old_list, playing_index, new_list) if playing_index >= 0 else 0
+        
+        self.current_media_list = new_list
+        self.awaited_frame = None
+        self.preload_images(self.current_media_list)
+        self.waiting_screen_shown = False
+        self.schedule_media_tick()
+        
+        current_schedule = ready['schedule']
+        if current_schedule:
+            schedule_name = current_schedule.get("name", "Unknown")
+            print(f"📺 Loaded schedule: {schedule_name} with {len(self.current_media_list)} items.")
+            self.player_manager.send_status("playing" if self.current_media_list else "idle")
+        else:
+            self.player_manager.send_status("idle")
     
     def display_current_media(self):
         now = time.time()
@@ -910,15 +1573,10 @@ class UltraDisplayApp:
         if not self.current_media_item:
             should_move_to_next = True
         elif self.current_media_item.get('type') == 'video':
-            if self.player_manager.vlc_player:
-                try:
-                    state = self.player_manager.vlc_player.get_state()
-                    if state in [vlc.State.Ended, vlc.State.Error]:
-                        should_move_to_next = True
-                except: should_move_to_next = True
+            # Set by on_media_event() when VLC reports end of media or an error
+            should_move_to_next = self.video_finished
         else:
-            duration = self.current_media_item.get('playlistDuration') or self.current_media_item.get('duration', 5)
-            if now - self.media_start_time >= duration:
+            if now - self.media_start_time >= item_duration(self.current_media_item):
                 should_move_to_next = True
         
         if should_move_to_next and self.current_media_list:
@@ -936,62 +1594,204 @@ class UltraDisplayApp:
             elif media_type == 'video': success = self.display_video(self.current_media_item)
             
             if success:
+                if self.player_manager.time_to_first_frame_ms is None:
+                    self.record_first_frame()
                 self.media_start_time = now
+                self.video_finished = False
                 self.player_manager.push_playback_state(self.current_media_item, 'playing')
                 self.current_index += 1
+                if media_type != 'video':
+                    self.player_manager.start_decode_validation(self.decoder_idle)
+            elif success is None:
+                # Hold the playhead on this slide (the previous one stays on screen)
+                # until its render finishes
+                self.current_media_item = None
             else:
                 print(f"❌ Failed to display {self.current_media_item.get('name', 'Unknown')}")
                 self.current_media_item = None
                 self.current_index += 1
+            self.prefetch_frames()
     
+    def decoder_idle(self):
+        """Whether the decode benchmark may play a clip now (any thread).
+
+        No video may be playing or pre-rolled, and a slide followed by a video
+        must have DECODE_BENCHMARK_WINDOW seconds left.
+        """
+        item = self.current_media_item
+        if self.preroll or (item and item.get('type') == 'video'):
+            return False
+        media_list = self.current_media_list
+        if not item or not media_list:
+            return True
+        next_item = media_list[self.current_index % len(media_list)]
+        remaining = self.media_start_time + item_duration(item) - time.time()
+        return next_item.get('type') != 'video' or remaining >= DECODE_BENCHMARK_WINDOW
+
+    def record_first_frame(self):
+        manager = self.player_manager
+        manager.time_to_first_frame_ms = int((time.monotonic() - STARTUP_TIME) * 1000)
+        manager.boot_source = manager.boot_source or 'network'
+        print(f"⏱️ Time to first frame: {manager.time_to_first_frame_ms} ms (from {manager.boot_source})")
+        manager.send_heartbeat()
+
+    def post_media_event(self, player, kind):
+        """VLC event thread: queue end-of-media/error events for the Tk thread.
+
+        Never touches Tk: a libvlc callback that waits on Tk deadlocks with
+        the Tk thread waiting in vlc_player.stop() for that same callback.
+        """
+        self.media_event_queue.put((player, kind))
+
+    def _relay_media_events(self):
+        """Relay thread: wake the Tk thread for each queued VLC event.
+
+        Blocking in event_generate() is harmless here, unlike in the libvlc
+        callback that vlc_player.stop() waits for.
+        """
+        while True:
+            event = self.media_event_queue.get()
+            if event is None:
+                return
+            self.media_events.put(event)
+            try:
+                self.root.event_generate('<<MediaEvent>>', when='tail')
+            except Exception:
+                pass
+
+    def start_media_event_relay(self):
+        self.media_event_relay = threading.Thread(target=self._relay_media_events, name="media-event-relay")
+        self.media_event_relay.daemon = True
+        self.media_event_relay.start()
+
+    def on_media_event(self, event=None):
+        finished = False
+        try:
+            while True:
+                player, kind = self.media_events.get_nowait()
+                # Ignore events from players that were already replaced
+                if player is self.player_manager.vlc_player:
+                    if kind == 'error':
+                        print(f"❌ VLC error while playing {self.current_media_item.get('name', 'Unknown') if self.current_media_item else 'video'}")
+                    finished = True
+        except queue.Empty:
+            pass
+        
+        if finished and not self.is_destroying:
+            self.video_finished = True
+            self.display_current_media()
+            self.schedule_media_tick()
+
+    def check_video_watchdog(self):
+        """Safety net for a lost VLC event, checked on every video tick"""
+        if self.current_media_item and self.current_media_item.get('type') == 'video' and self.player_manager.vlc_player:
+            try:
+                if self.player_manager.vlc_player.get_state() in [vlc.State.Ended, vlc.State.Error]:
+                    self.video_finished = True
+            except Exception:
+                self.video_finished = True
+
+    def notify_ui(self):
+        """Any thread: wake the Tk thread to drain the background queues"""
+        try:
+            self.root.event_generate('<<SyncUpdate>>', when='tail')
+        except Exception:
+            pass
+
+    def on_sync_update(self, event=None):
+        self.update_ticker()
+        self.apply_ready_content()
+        self.load_rendered_frames()
+        if self.awaited_frame and self.awaited_frame.done():
+            self.awaited_frame = None
+            self.media_tick()
+
     def show_waiting_screen(self):
         if not self.current_media_list and (time.time() - self.last_schedule_check > 2):
             self.player_manager.push_playback_state(None, 'idle')
             self.display_text("Waiting for content ...")
-    
-    def main_loop(self):
+            self.waiting_screen_shown = True
+            self.player_manager.start_decode_validation(self.decoder_idle)
+
+    # --- Scheduled tasks: each one re-registers its own next deadline ---
+
+    def media_tick(self):
         try:
-            if self.is_destroying:
-                return
-            
-            self.update_ticker()
-            self.check_schedule()
-            
             if self.current_media_list:
+                self.check_video_watchdog()
                 self.display_current_media()
+
+                if self.current_media_item and self.current_media_item.get('type') == 'video' and self.player_manager.vlc_player:
+                    try:
+                        vlc_time = self.player_manager.vlc_player.get_time() / 1000.0
+                        if vlc_time > 0:
+                            self.player_manager.push_playback_state(self.current_media_item, 'playing', vlc_time)
+                        # Pre-roll only near the end, so two decoders are open for seconds, not the whole clip
+                        length = self.player_manager.vlc_player.get_length() / 1000.0
+                        if length > 0 and length - vlc_time <= self.preroll_lead:
+                            self.preroll_next_video()
+                    except Exception:
+                        pass
             else:
                 self.show_waiting_screen()
-            
-            self.ensure_overlays_visible()
-            self.player_manager.load_logo()
-            
-            now = time.time()
-            if now - self.last_heartbeat > 60:
-                self.player_manager.send_heartbeat()
-                self.last_heartbeat = now
-
-            if self.current_media_item and self.current_media_item.get('type') == 'video' and self.player_manager.vlc_player:
-                try:
-                    vlc_time = self.player_manager.vlc_player.get_time() / 1000.0
-                    if vlc_time > 0:
-                        self.player_manager.push_playback_state(self.current_media_item, 'playing', vlc_time)
-                except Exception:
-                    pass
-            
-            if not self.is_destroying:
-                self.root.after(100, self.main_loop)
-        except Exception as e:
-            print(f"Error in main loop: {e}")
-            if not self.is_destroying:
-                self.root.after(2000, self.main_loop)
+        finally:
+            # Playback must keep going even if this tick failed
+            self.schedule_media_tick()
+
+    def schedule_media_tick(self):
+        """Register the next media deadline: image/text expiry, video tick or nothing"""
+        if self.is_destroying:
+            return
+        if self.awaited_frame:
+            # on_sync_update() resumes playback when the render finishes
+            self.scheduler.cancel('media')
+            return
+        if not self.current_media_list:
+            if self.waiting_screen_shown:
+                # Idle until apply_ready_content() brings content
+                self.scheduler.cancel('media')
+                return
+            delay = VIDEO_TICK_INTERVAL
+        elif not self.current_media_item:
+            delay = FAILED_MEDIA_RETRY
+        elif self.current_media_item.get('type') == 'video':
+            delay = VIDEO_TICK_INTERVAL
+        else:
+            delay = self.media_start_time + item_duration(self.current_media_item) - time.time()
+        self.scheduler.schedule('media', delay, self.media_tick)
+
+    def heartbeat_tick(self):
+        self.player_manager.send_heartbeat()
+        self.scheduler.schedule('heartbeat', HEARTBEAT_INTERVAL, self.heartbeat_tick)
+
+    def logo_tick(self):
+        self.player_manager.load_logo()
+        self.scheduler.schedule('logo', LOGO_CHECK_INTERVAL, self.logo_tick)
+
+    def overlay_tick(self):
+        self.ensure_overlays_visible()
+        self.scheduler.schedule('overlays', OVERLAY_CHECK_INTERVAL, self.overlay_tick)
+
+    def sync_tick(self):
+        self.on_sync_update()
+        self.scheduler.schedule('sync', SYNC_SAFETY_INTERVAL, self.sync_tick)
+
+    def start_scheduler(self):
+        self.scheduler.schedule('sync', 0, self.sync_tick)
+        self.scheduler.schedule('media', 0.1, self.media_tick)
+        self.scheduler.schedule('heartbeat', 0, self.heartbeat_tick)
+        self.scheduler.schedule('logo', LOGO_CHECK_INTERVAL, self.logo_tick)
+        self.scheduler.schedule('overlays', OVERLAY_CHECK_INTERVAL, self.overlay_tick)
     
     def start(self):
-        if not self.connect_to_cms():
-            print("⚠️ CMS connection failed - continuing with default overlays")
-        
-        print(f"🚀 Starting Ultra Player for Player ID: {self.player_manager.player_id}")
+        print("🚀 Starting Ultra Player")
         
-        self.root.after(100, self.main_loop)
+        # Cached content is shown first; the sync engine connects to the CMS in the background
+        self.start_metrics()
+        self.start_media_event_relay()
+        self.start_peer_sharing()
+        self.start_sync_engine()
+        self.start_scheduler()
         
         try:
             self.root.mainloop()
@@ -1002,9 +1802,23 @@ class UltraDisplayApp:
         if self.is_destroying: return
         self.is_destroying = True
         print("🛑 Stopping Ultra Player...")
+        self.scheduler.stop()
+        self.media_event_queue.put(None)
         
         try:
             self.stop_ticker()
+            self.download_manager.shutdown()
+            if self.peer_discovery:
+                self.peer_discovery.stop()
+            if self.peer_server:
+                self.peer_server.shutdown()
+            if self.peer_session:
+                self.peer_session.close()
+            if self.metrics_server:
+                self.metrics_server.shutdown()
+            self.frame_renderer.shutdown()
+            self.frame_loader.shutdown(wait=False, cancel_futures=True)
+            self.discard_preroll()
             if self.player_manager.vlc_player:
                 try: self.player_manager.vlc_player.stop()
                 except: pass
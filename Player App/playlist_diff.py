@@ -0,0 +1,88 @@
+# playlist_diff.py
+
+
+def media_key(media_item):
+    """Identity of one asset revision: same key means the same bytes on screen"""
+    return (
+        media_item.get('id'),
+        media_item.get('type'),
+        media_item.get('h265_url') or media_item.get('url'),
+        media_item.get('checksum') or media_item.get('uploadedAt')
+    )
+
+
+def item_duration(media_item):
+    return media_item.get('playlistDuration') or media_item.get('duration', 5)
+
+
+class PlaylistDiff:
+    """Differences between two playlists, compared by media_key()"""
+
+    def __init__(self, old_list, new_list):
+        old_keys = [media_key(item) for item in old_list]
+        new_keys = [media_key(item) for item in new_list]
+        old_set, new_set = set(old_keys), set(new_keys)
+
+        self.added = [item for item in new_list if media_key(item) not in old_set]
+        self.removed = [item for item in old_list if media_key(item) not in new_set]
+
+        old_durations = {media_key(item): item_duration(item) for item in old_list}
+        self.duration_changed = [item for item in new_list
+                                 if media_key(item) in old_durations and old_durations[media_key(item)] != item_duration(item)]
+
+        kept_old = [key for key in old_keys if key in new_set]
+        kept_new = [key for key in new_keys if key in old_set]
+        self.reordered = kept_old != kept_new
+
+    def is_empty(self):
+        return not (self.added or self.removed or self.duration_changed or self.reordered)
+
+    def summary(self):
+        parts = [f"+{len(self.added)}", f"-{len(self.removed)}"]
+        if self.duration_changed:
+            parts.append(f"{len(self.duration_changed)} duration change(s)")
+        if self.reordered:
+            parts.append("reordered")
+        return ", ".join(parts)
+
+
+def reuse_local_paths(old_list, new_list):
+    """Copy local_path from already-downloaded items onto matching new items.
+
+    Returns the new items that still need to be downloaded.
+    """
+    local_paths = {media_key(item): item['local_path'] for item in old_list if item.get('local_path')}
+    missing = []
+    for media_item in new_list:
+        local_path = local_paths.get(media_key(media_item))
+        if local_path:
+            media_item['local_path'] = local_path
+        elif media_item.get('type') in ['image', 'video']:
+            missing.append(media_item)
+    return missing
+
+
+def map_playhead(old_list, old_index, new_list):
+    """Find the item playing at old_list[old_index] in new_list.
+
+    Repeated items are matched by occurrence (the 2nd copy maps to the 2nd
+    copy). Returns the new index, or None if the item was removed.
+    """
+    if not (0 <= old_index < len(old_list)):
+        return None
+    key = media_key(old_list[old_index])
+    occurrence = sum(1 for item in old_list[:old_index] if media_key(item) == key)
+
+    matches = [i for i, item in enumerate(new_list) if media_key(item) == key]
+    if not matches:
+        return None
+    return matches[min(occurrence, len(matches) - 1)]
+
+
+def next_surviving_index(old_list, old_index, new_list):
+    """Index in new_list of the first item after old_index that survived the update"""
+    for offset in range(1, len(old_list) + 1):
+        new_index = map_playhead(old_list, (old_index + offset) % len(old_list), new_list)
+        if new_index is not None:
+            return new_index
+    return 0
@@ -0,0 +1,75 @@
+# state_reporter.py
+import collections
+import threading
+
+
+class PlaybackStateReporter:
+    """Coalescing background reporter for player playback state.
+
+    report() never blocks the caller. Status or media changes are flushed
+    right away; progress updates (currentTime) are coalesced and sent at most
+    once per interval. Only the newest progress state is kept, and at most
+    max_pending state changes are buffered, so a slow CMS drops stale updates
+    instead of building up a queue.
+    """
+
+    def __init__(self, send_batch, send_single, interval=1.0, max_pending=10, min_gap=0.2):
+        # send_batch(states) -> bool: deliver a list over the WebSocket, False if unavailable
+        # send_single(state): HTTP fallback for the newest state
+        self.send_batch = send_batch
+        self.send_single = send_single
+        self.interval = interval
+        self.min_gap = min_gap
+        self.pending = collections.deque(maxlen=max_pending)
+        self.latest = None
+        self.last_key = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wakeup.set()
+
+    def report(self, state):
+        key = (state.get('status'), state.get('mediaUrl'))
+        with self.lock:
+            if key != self.last_key:
+                self.last_key = key
+                self.pending.append(state)
+                self.latest = None
+                self.wakeup.set()
+            else:
+                self.latest = state
+
+    def _take_batch(self):
+        with self.lock:
+            batch = list(self.pending)
+            if self.latest:
+                batch.append(self.latest)
+            self.pending.clear()
+            self.latest = None
+            return batch
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                if not self.send_batch(batch):
+                    self.send_single(batch[-1])
+            except Exception as e:
+                print(f"Failed to report playback state: {e}")
+
+            # Rate limit bursts of state changes; anything arriving meanwhile is batched
+            self.stop_event.wait(self.min_gap)
@@ -0,0 +1,104 @@
+# ws_client.py
+import random
+import threading
+import time
+
+import websocket
+
+
+class ReconnectingWebSocket:
+    """WebSocket connection that survives CMS restarts and network drops.
+
+    run_forever() is restarted after every disconnect, with full-jitter
+    exponential backoff so a fleet of players does not reconnect in lockstep.
+    Protocol pings detect half-open connections. on_open runs on every
+    (re)connect, so the caller re-sends its subscription there; prepare runs
+    before each attempt and can re-authenticate (return False to back off).
+    """
+
+    def __init__(self, url, on_open, on_message, prepare=None, on_disconnect=None,
+                 ping_interval=20, ping_timeout=10, backoff_base=1.0, backoff_max=60.0, stable_after=30):
+        self.url = url
+        self.on_open = on_open
+        self.on_message = on_message
+        self.prepare = prepare
+        self.on_disconnect = on_disconnect
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # A connection that lasted this long resets the backoff
+        self.stable_after = stable_after
+
+        self.app = None
+        self.is_open = False
+        self.attempt = 0
+        self.opened_at = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def close(self):
+        self.stop_event.set()
+        app = self.app
+        if app:
+            app.close()
+
+    def reconnect(self):
+        """Drop the current connection; the run loop connects again (e.g. to a new url)"""
+        app = self.app
+        if app:
+            app.close()
+
+    def send(self, message):
+        app = self.app
+        if not (app and self.is_open):
+            raise websocket.WebSocketConnectionClosedException("WebSocket is not connected")
+        app.send(message)
+
+    def backoff_delay(self):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** min(self.attempt, 16)))
+
+    def _handle_open(self, ws):
+        self.is_open = True
+        self.opened_at = time.monotonic()
+        print("WebSocket connected")
+        self.on_open(ws)
+
+    def _handle_error(self, ws, error):
+        print(f"WebSocket error: {error}")
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.opened_at = None
+            if self.prepare is None or self.prepare():
+                self.app = websocket.WebSocketApp(
+                    self.url,
+                    on_open=self._handle_open,
+                    on_message=lambda ws, message: self.on_message(message),
+                    on_error=self._handle_error
+                )
+                try:
+                    self.app.run_forever(ping_interval=self.ping_interval, ping_timeout=self.ping_timeout)
+                except Exception as e:
+                    print(f"WebSocket connection error: {e}")
+
+                was_open = self.is_open
+                self.is_open = False
+                if was_open:
+                    print("WebSocket connection closed")
+                    if self.on_disconnect:
+                        self.on_disconnect()
+
+            if self.stop_event.is_set():
+                break
+            if self.opened_at and time.monotonic() - self.opened_at >= self.stable_after:
+                self.attempt = 0
+            delay = self.backoff_delay()
+            self.attempt += 1
+            print(f"🔌 Reconnecting to CMS in {delay:.1f}s (attempt {self.attempt})")
+            self.stop_event.wait(delay)